@@ -1,3 +1,19 @@
+from urllib.parse import quote
+
+
+def quote_param(value: str) -> str:
+    """
+    Кодирует значение параметра запроса к API (жанр, название фильма).
+
+    Символы &, #, пробелы и другие не нарушают строку запроса, а одинаковые
+    значения всегда дают одинаковый URL — ключ кэша ответов.
+
+    :param value: Значение параметра.
+    :return: Значение, закодированное для строки запроса.
+    """
+    return quote(str(value), safe="")
+
+
 def truncate_description(description: str, max_length: int = 950) -> str:
     """
     Обрезает строку описания до заданной длины, сохраняя текст до последней точки.
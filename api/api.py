@@ -1,20 +1,70 @@
+import asyncio
+import contextvars
+import functools
 import logging.config
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
 
+import aiohttp
 import requests
 
-from config_data.config import RAPID_API_KEY
+from api.hedging import hedger
+from api.key_pool import key_pool
+from config_data.config import API_CACHE_REVALIDATE, API_STALE_TIMEOUT
+from logger_helper.context import (
+    describe_search,
+    mark_stale_response,
+    record_api_call,
+    update_context,
+)
 from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.metrics import registry
+from utils.overload import SHED_REQUESTS, OverloadedError, overload_controller
+from utils.response_cache import page_counts, response_cache
+from utils.tracing import SPAN_KIND_CLIENT, tracer
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("api")
 
 url = "https://api.kinopoisk.dev/"
-headers = {"accept": "application/json", "X-API-KEY": RAPID_API_KEY}
+headers = {"accept": "application/json"}
+
+API_REQUEST_DURATION = registry.histogram(
+    "kinopoisk_request_duration_seconds",
+    "Длительность запросов к API Кинопоиска",
+    ["endpoint"],
+)
+API_REQUESTS = registry.counter(
+    "kinopoisk_requests",
+    "Запросы к API Кинопоиска по статусу ответа",
+    ["endpoint", "status"],
+)
+STALE_RESPONSES = registry.counter(
+    "kinopoisk_stale_responses",
+    "Устаревшие ответы API из кэша: с обновлением в фоне (revalidate) "
+    "или вместо неудачного (error) и долгого (timeout) запроса",
+    ["reason"],
+)
+
+
+# Количество запросов к API, ожидающих ответа
+_in_flight = 0
+
+# Фоновые обновления ответов в кэше по URL запроса
+_revalidations: Dict[str, "asyncio.Task[Any]"] = {}
+
+
+def in_flight_requests() -> int:
+    """Возвращает количество запросов к API, ожидающих ответа."""
+    return _in_flight
 
 
 def fetch_data():
     try:
-        response = requests.get(url, headers=headers)
+        response = requests.get(
+            url, headers={**headers, "X-API-KEY": key_pool.keys[0].key}
+        )
         response.raise_for_status()
         logger.debug("Успешный запрос к API: %s", response.status_code)
     except (
@@ -25,4 +75,151 @@ def fetch_data():
         logger.error("Ошибка при декодировании JSON: %s", e)
 
 
+async def get_json(session: aiohttp.ClientSession, request_url: str) -> Any:
+    """
+    Выполняет GET-запрос к API и возвращает тело ответа в виде JSON.
+
+    Количество и длительность запросов учитываются в контексте обрабатываемого
+    обновления и попадают в его логи. Свежий ответ из кэша возвращается без
+    запроса; в режиме перегрузки CACHED_ONLY запросы не выполняются вовсе.
+    Устаревший не более чем на API_CACHE_REVALIDATE секунд ответ возвращается
+    сразу и обновляется в фоне. Для более старого ответа API ожидается не
+    дольше API_STALE_TIMEOUT секунд: при ошибке или превышении времени
+    возвращается ответ из кэша, а обновление отмечается как получившее
+    устаревшие данные (см. stale_response_served).
+    Ключ API для запроса выбирается из пула ключей по остатку лимита.
+
+    :param session: Сессия aiohttp.
+    :param request_url: Полный URL запроса.
+    :return: Разобранный JSON-ответ.
+    :raises aiohttp.ClientError: При ошибке соединения, статусе ответа 4xx/5xx
+        или если все ключи API отстранены, а ответа в кэше нет.
+    :raises OverloadedError: Если бот перегружен, а ответа в кэше нет.
+    """
+    cached, age = response_cache.lookup(request_url)
+    if cached is not None:
+        if age <= response_cache.ttl or overload_controller.cached_only:
+            return cached
+        if age <= response_cache.ttl + API_CACHE_REVALIDATE:
+            STALE_RESPONSES.inc("revalidate")
+            _revalidate(request_url)
+            return cached
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(_revalidate(request_url)), API_STALE_TIMEOUT
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            STALE_RESPONSES.inc(reason)
+            mark_stale_response()
+            logger.warning(
+                "API request %s failed (%s), serving cached response %.0f s old",
+                urlsplit(request_url).path,
+                reason,
+                age,
+            )
+            return cached
+
+    if overload_controller.cached_only:
+        SHED_REQUESTS.inc("cache_miss")
+        raise OverloadedError(f"No cached response for {urlsplit(request_url).path}")
+    return await _fetch(session, request_url)
+
+
+def _revalidate(request_url: str) -> "asyncio.Task[Any]":
+    """
+    Запускает фоновое обновление ответа в кэше (не больше одного на URL).
+
+    Обновление выполняется в собственной сессии и вне контекста обновления
+    Telegram: сессия вызывающего кода может закрыться раньше, чем придет ответ.
+
+    :param request_url: Полный URL запроса.
+    :return: Задача, результатом которой будет свежий ответ.
+    """
+    task = _revalidations.get(request_url)
+    if task is None:
+        task = asyncio.create_task(_refresh(request_url), context=contextvars.Context())
+        _revalidations[request_url] = task
+        task.add_done_callback(functools.partial(_revalidation_done, request_url))
+    return task
+
+
+async def _refresh(request_url: str) -> Any:
+    async with aiohttp.ClientSession() as session:
+        return await _fetch(session, request_url)
+
+
+def _revalidation_done(request_url: str, task: "asyncio.Task[Any]") -> None:
+    _revalidations.pop(request_url, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug(
+            "Background refresh of %s failed: %s",
+            urlsplit(request_url).path,
+            task.exception(),
+        )
+
+
+async def _fetch(session: aiohttp.ClientSession, request_url: str) -> Any:
+    """
+    Выполняет запрос к API (при долгом ответе — со страхующим повтором)
+    и сохраняет ответ в кэш.
+    """
+    endpoint = urlsplit(request_url).path
+    data = await hedger.run(endpoint, lambda: _attempt(session, request_url))
+    response_cache.put(request_url, data)
+    page_counts.put(request_url, data)
+    return data
+
+
+async def _attempt(session: aiohttp.ClientSession, request_url: str) -> Any:
+    """Выполняет одну попытку запроса к API."""
+    global _in_flight
+
+    parts = urlsplit(request_url)
+    endpoint = parts.path
+    api_key = key_pool.acquire()
+    status: Optional[int] = None
+    outcome = "error"
+    started = time.perf_counter()
+    _in_flight += 1
+    try:
+        with tracer.span(
+            f"GET {endpoint}", SPAN_KIND_CLIENT, **{"http.method": "GET"}
+        ) as span:
+            span.set_attribute("http.url", f"{parts.scheme}://{parts.netloc}{endpoint}")
+            span.set_attribute("kinopoisk.key_id", api_key.key_id)
+            context = update_context.get()
+            for name, value in ((context or {}).get("search") or {}).items():
+                span.set_attribute(f"search.{name}", value)
+            async with session.get(
+                request_url, headers={**headers, "X-API-KEY": api_key.key}
+            ) as response:
+                status = response.status
+                outcome = str(status)
+                key_pool.report(api_key, status, response.headers.get("Retry-After"))
+                span.set_attribute("http.status_code", status)
+                response.raise_for_status()
+                data = await response.json()
+        hedger.observe(endpoint, time.perf_counter() - started)
+        return data
+    except asyncio.CancelledError:
+        # Попытка отменена: ответила другая (страхующая) попытка
+        outcome = "cancelled"
+        raise
+    finally:
+        _in_flight -= 1
+        elapsed = time.perf_counter() - started
+        record_api_call(elapsed)
+        API_REQUEST_DURATION.observe(elapsed, endpoint)
+        API_REQUESTS.inc(endpoint, outcome)
+        logger.debug(
+            "API request %s (%s) finished with status %s in %.1f ms",
+            endpoint,
+            describe_search() or "no search",
+            outcome,
+            elapsed * 1000,
+        )
+
+
 fetch_data()
@@ -0,0 +1,157 @@
+import asyncio
+import logging.config
+import time
+from typing import List, Optional, Sequence
+
+import aiohttp
+
+from api import quote_param
+from api.api import get_json, in_flight_requests, url
+from api.key_pool import key_pool
+from config_data.config import (
+    CACHE_WARM_COUNT,
+    CACHE_WARM_DELAY,
+    CACHE_WARM_INTERVAL,
+    CACHE_WARM_MIN_QUOTA,
+    CACHE_WARM_RATINGS,
+)
+from keyboards.reply import genres
+from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.metrics import registry
+from utils.overload import NORMAL, OverloadedError, overload_controller
+from utils.response_cache import page_counts
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("cache_warmer")
+
+CACHE_WARM_REQUESTS = registry.counter(
+    "cache_warm_requests",
+    "Запросы прогрева кэша ответов API по результату",
+    ["result"],
+)
+
+
+class CacheWarmer:
+    """
+    Прогрев кэша ответов API и таблицы количества фильмов для популярных
+    фильтров: жанров с клавиатуры и распространенных диапазонов рейтинга.
+    Прогреваются только запросы, которые обработчики строят так же (первая
+    страница с limit=count): поиск по названию зависит от точного текста и
+    количества, введенных пользователем, и не прогревается.
+
+    Прогрев выполняется после запуска бота и затем каждые interval секунд.
+    Запросы идут по одному с паузой delay, только пока нет запросов
+    пользователей к API и бот не перегружен, и прекращаются, когда остаток
+    суточного лимита ключей опускается до min_quota. Фильтры, количество
+    фильмов по которым еще известно, пропускаются.
+
+    Кэши хранятся в памяти процесса. При нескольких рабочих процессах прогрев
+    выполняет только один из них, чтобы не умножать запросы к API и расход
+    суточного лимита.
+
+    Атрибуты:
+        interval (float): Интервал между прогревами в секундах (0 — не прогревать).
+        count (int): Количество фильмов в прогреваемых запросах.
+        ratings (tuple): Диапазоны рейтинга IMDb, например "7-10".
+        delay (float): Пауза между запросами в секундах.
+        min_quota (int): Остаток суточного лимита, при котором прогрев прекращается.
+    """
+
+    def __init__(
+        self,
+        interval: float = CACHE_WARM_INTERVAL,
+        count: int = CACHE_WARM_COUNT,
+        ratings: Sequence[str] = CACHE_WARM_RATINGS,
+        delay: float = CACHE_WARM_DELAY,
+        min_quota: int = CACHE_WARM_MIN_QUOTA,
+    ) -> None:
+        self.interval = interval
+        self.count = count
+        self.ratings = tuple(ratings)
+        self.delay = delay
+        self.min_quota = min_quota
+        self._task: Optional[asyncio.Task] = None
+
+    def targets(self) -> List[str]:
+        """
+        Возвращает URL запросов для прогрева в том виде, в каком их строят
+        модули API, чтобы ответы попали в кэш под теми же ключами.
+        """
+        # Обработчики сохраняют жанр в нижнем регистре
+        urls = [
+            f"{url}v1.4/movie/search?page=1&limit={self.count}"
+            f"&genres.name={quote_param(genre.lower())}"
+            for genre in genres
+            if genre != "Отмена"
+        ]
+        urls += [
+            f"{url}v1.4/movie?page=1&limit={self.count}&rating.imdb={rating}"
+            for rating in self.ratings
+        ]
+        return [target for target in urls if target not in page_counts]
+
+    def _quota_exhausted(self) -> bool:
+        return bool(key_pool.limit) and key_pool.remaining() <= self.min_quota
+
+    async def _wait_idle(self) -> None:
+        """Ожидает, пока нет запросов пользователей к API и перегрузки."""
+        while in_flight_requests() > 0 or overload_controller.level > NORMAL:
+            await asyncio.sleep(self.delay or 1)
+
+    async def warm(self) -> int:
+        """
+        Выполняет один прогрев.
+
+        :return: Количество выполненных запросов.
+        """
+        started = time.monotonic()
+        urls = self.targets()
+        done = 0
+        async with aiohttp.ClientSession() as session:
+            for target in urls:
+                await self._wait_idle()
+                if self._quota_exhausted():
+                    CACHE_WARM_REQUESTS.inc("skipped", amount=len(urls) - done)
+                    logger.info("Cache warm-up stopped: API quota is running low.")
+                    break
+                try:
+                    await get_json(session, target)
+                    CACHE_WARM_REQUESTS.inc("ok")
+                except (aiohttp.ClientError, OverloadedError, ValueError) as e:
+                    CACHE_WARM_REQUESTS.inc("error")
+                    logger.debug("Cache warm-up request failed: %s", e)
+                done += 1
+                await asyncio.sleep(self.delay)
+        logger.info(
+            "Cache warm-up finished: %d of %d requests in %.1f s",
+            done,
+            len(urls),
+            time.monotonic() - started,
+        )
+        return done
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.error("Error warming up caches: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """Запускает прогрев после запуска бота и по расписанию."""
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает прогрев."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+cache_warmer = CacheWarmer()
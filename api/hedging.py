@@ -0,0 +1,119 @@
+import asyncio
+import math
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from config_data.config import API_HEDGE_BUDGET, API_HEDGE_MIN_DELAY
+from utils.metrics import registry
+
+HEDGED_REQUESTS = registry.counter(
+    "kinopoisk_hedged_requests",
+    "Повторные (страхующие) запросы к API Кинопоиска, отправленные из-за "
+    "долгого ответа; доля — отношение к kinopoisk_requests",
+    ["endpoint"],
+)
+HEDGE_WINS = registry.counter(
+    "kinopoisk_hedge_wins",
+    "Страхующие запросы к API Кинопоиска, ответившие раньше первого",
+    ["endpoint"],
+)
+
+# Количество последних длительностей запросов, по которым считается p95
+WINDOW = 200
+# Наименьшее количество измерений, после которого запросы страхуются
+MIN_SAMPLES = 20
+# Наибольший запас страхующих запросов, накапливаемый бюджетом
+MAX_TOKENS = 10.0
+
+
+class Hedger:
+    """
+    Страхующие (hedged) запросы к API.
+
+    Если запрос не получил ответа за время p95 длительности последних запросов
+    к тому же эндпоинту (но не меньше min_delay), отправляется второй такой же
+    запрос. Используется ответ, пришедший первым, второй запрос отменяется.
+    Каждый обычный запрос пополняет бюджет на budget страхующего запроса,
+    поэтому дополнительная нагрузка на API не превышает доли budget.
+
+    Атрибуты:
+        budget (float): Доля запросов, которые можно продублировать (0 — не страховать).
+        min_delay (float): Наименьшая задержка перед страхующим запросом в секундах.
+    """
+
+    def __init__(self, budget: float, min_delay: float) -> None:
+        self.budget = budget
+        self.min_delay = min_delay
+        self._tokens = 0.0
+        self._durations: Dict[str, Deque[float]] = {}
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        """Учитывает длительность завершившегося запроса."""
+        durations = self._durations.get(endpoint)
+        if durations is None:
+            durations = self._durations[endpoint] = deque(maxlen=WINDOW)
+        durations.append(seconds)
+
+    def delay(self, endpoint: str) -> Optional[float]:
+        """
+        Возвращает задержку перед страхующим запросом.
+
+        :param endpoint: Путь запроса.
+        :return: p95 длительности запросов или None, если измерений мало.
+        """
+        durations = self._durations.get(endpoint)
+        if durations is None or len(durations) < MIN_SAMPLES:
+            return None
+        ordered = sorted(durations)
+        p95 = ordered[math.ceil(len(ordered) * 0.95) - 1]
+        return max(p95, self.min_delay)
+
+    def _try_spend(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def run(self, endpoint: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет запрос, при долгом ответе страхуя его повторным.
+
+        :param endpoint: Путь запроса (для p95 и метрик).
+        :param attempt: Функция, выполняющая одну попытку запроса.
+        :return: Результат попытки, завершившейся первой без ошибки.
+        """
+        if self.budget <= 0:
+            return await attempt()
+        self._tokens = min(self._tokens + self.budget, MAX_TOKENS)
+        delay = self.delay(endpoint)
+        if delay is None:
+            return await attempt()
+
+        primary = asyncio.ensure_future(attempt())
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done or not self._try_spend():
+                return await primary
+
+            HEDGED_REQUESTS.inc(endpoint)
+            hedge = asyncio.ensure_future(attempt())
+            pending.add(hedge)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            HEDGE_WINS.inc(endpoint)
+                        return task.result()
+                if not pending:
+                    # Обе попытки завершились ошибкой: возвращается ошибка первой
+                    return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+hedger = Hedger(API_HEDGE_BUDGET, API_HEDGE_MIN_DELAY)
@@ -3,9 +3,12 @@ import random
 
 import aiohttp
 
-from api import truncate_description
-from api.api import headers, url
+from api import quote_param, truncate_description
+from api.api import get_json, url
+from logger_helper.context import mark_api_failure, set_search_params
 from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.overload import OverloadedError, overload_controller
+from utils.response_cache import page_counts
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("high_budget_movie_api")
@@ -20,75 +23,90 @@ async def high_budget_movie(budget: str, count: int, genre: str) -> list:
     :param count: Количество вариантов для получения.
     :return: Текстовый ответ с найденными фильмами или сообщение об их отсутствии.
     """
+    # При перегрузке запрашивается меньше результатов
+    count = overload_controller.cap_count(count)
+    set_search_params(genre=genre, budget=budget, count=count)
+
     if genre:
-        url_name = f"{url}v1.4/movie?page=1&limit={count}&budget.value={budget}&genres.name={genre}"
+        url_name = f"{url}v1.4/movie?page=1&limit={count}&budget.value={budget}&genres.name={quote_param(genre)}"
     else:
         url_name = f"{url}v1.4/movie?page=1&limit={count}&budget.value={budget}"
 
     async with aiohttp.ClientSession() as session:
         try:
-            async with session.get(url_name, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
+            # Если количество фильмов по фильтру уже известно, первая
+            # страница не запрашивается: сразу выбирается случайная
+            data = None
+            pages = page_counts.pages(url_name, count)
+            if pages is None:
+                data = await get_json(session, url_name)
                 pages = data.get("pages", 0)
 
-                if pages == 0:
-                    logger.warning("No movies found for the given criteria.")
-                    return []
+            if pages == 0:
+                logger.warning("No movies found for the given criteria.")
+                return []
 
-                number_page = random.randrange(1, pages)
-                if genre:
-                    url_page = f"{url}v1.4/movie?page={number_page}&limit={count}&budget.value={budget}&genres.name={genre}"
-                else:
-                    url_page = f"{url}v1.4/movie?page={number_page}&limit={count}&budget.value={budget}"
+            number_page = random.randrange(1, pages)
+            if genre:
+                url_page = (
+                    f"{url}v1.4/movie?page={number_page}&limit={count}&budget.value={budget}"
+                    f"&genres.name={quote_param(genre)}"
+                )
+            else:
+                url_page = f"{url}v1.4/movie?page={number_page}&limit={count}&budget.value={budget}"
 
-                async with session.get(url_page, headers=headers) as res:
-                    res.raise_for_status()
-                    data_movie = await res.json()
-                    movies = data_movie.get("docs", [])
+            try:
+                data_movie = await get_json(session, url_page)
+            except (aiohttp.ClientError, OverloadedError) as e:
+                # Случайной страницы может не быть в кэше (режим ответов из
+                # кэша), или API недоступно: используется первая страница,
+                # которая могла быть получена из кэша, в том числе устаревшей
+                logger.warning("Random page unavailable, using page 1: %r", e)
+                if data is None:
+                    data = await get_json(session, url_name)
+                data_movie = data
+            movies = data_movie.get("docs", [])
 
-                    saved_movies = []
+            saved_movies = []
 
-                    for movie in movies:
-                        name = movie.get("name") or movie.get("alternativeName")
+            for movie in movies:
+                name = movie.get("name") or movie.get("alternativeName")
 
-                        if not name and movie.get("names"):
-                            for name_obj in movie["names"]:
-                                if name_obj.get("name") and name_obj["name"].strip():
-                                    name = name_obj["name"]
-                                    break
+                if not name and movie.get("names"):
+                    for name_obj in movie["names"]:
+                        if name_obj.get("name") and name_obj["name"].strip():
+                            name = name_obj["name"]
+                            break
 
-                        if not name:
-                            continue
+                if not name:
+                    continue
 
-                        genres = ", ".join(genre["name"] for genre in movie["genres"])
-                        description = truncate_description(
-                            movie["description"] or "Нет данных"
-                        )
-                        poster_data = movie.get("poster")
-                        poster_url = (
-                            poster_data.get("previewUrl")
-                            if poster_data
-                            else "Нет данных"
-                        )
-                        saved_movies.append(
-                            {
-                                "name": name,
-                                "description": description,
-                                "rating": movie.get("rating", {}).get(
-                                    "imdb",
-                                )
-                                or "Нет данных",
-                                "year": movie["year"] or "Нет данных",
-                                "genres": genres or "Нет данных",
-                                "ageRating": movie.get("ageRating") or "Нет данных",
-                                "poster_url": poster_url or "Нет данных",
-                            }
+                genres = ", ".join(genre["name"] for genre in movie["genres"])
+                description = truncate_description(movie["description"] or "Нет данных")
+                poster_data = movie.get("poster")
+                poster_url = (
+                    poster_data.get("previewUrl") if poster_data else "Нет данных"
+                )
+                saved_movies.append(
+                    {
+                        "name": name,
+                        "description": description,
+                        "rating": movie.get("rating", {}).get(
+                            "imdb",
                         )
-                    return saved_movies
+                        or "Нет данных",
+                        "year": movie["year"] or "Нет данных",
+                        "genres": genres or "Нет данных",
+                        "ageRating": movie.get("ageRating") or "Нет данных",
+                        "poster_url": poster_url or "Нет данных",
+                    }
+                )
+            return saved_movies
         except aiohttp.ClientError as e:
             logger.error("API request error: %s", e)
+            mark_api_failure()
             return []
         except ValueError as e:
             logger.error("Data processing error: %s", e)
+            mark_api_failure()
             return []
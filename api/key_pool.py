@@ -0,0 +1,320 @@
+import asyncio
+import hashlib
+import logging.config
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+from peewee import EXCLUDED, Case
+
+from config_data.config import API_KEY_COOLDOWN, KINOPOISK_DAILY_LIMIT, RAPID_API_KEYS
+from database.executor import run_db
+from database.model import ApiKeyUsage
+from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.metrics import registry
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("api")
+
+# Интервал сохранения расхода ключей в базу данных в секундах
+FLUSH_INTERVAL = 30
+
+API_KEY_COOLDOWNS = registry.counter(
+    "kinopoisk_key_cooldowns",
+    "Отстранения ключей API Кинопоиска по статусу ответа",
+    ["key", "status"],
+)
+
+
+class ApiKeysExhaustedError(aiohttp.ClientError):
+    """
+    Все ключи API отстранены. Наследуется от aiohttp.ClientError, чтобы
+    обрабатываться так же, как неудачный запрос к API.
+    """
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _next_day() -> float:
+    """Возвращает время (time.time) начала следующих суток UTC."""
+    tomorrow = datetime.combine(_today() + timedelta(days=1), datetime.min.time())
+    return tomorrow.replace(tzinfo=timezone.utc).timestamp()
+
+
+class ApiKey:
+    """
+    Ключ API с учетом расхода за текущие сутки (UTC).
+
+    Атрибуты:
+        key (str): Значение ключа.
+        key_id (str): Короткий хэш ключа для логов, метрик и базы данных.
+        used (int): Количество запросов за текущие сутки всеми процессами:
+            общий расход из базы данных и еще не сохраненные запросы процесса.
+        cooldown_until (float): Время (time.time), до которого ключ отстранен.
+    """
+
+    __slots__ = (
+        "key",
+        "key_id",
+        "used",
+        "cooldown_until",
+        "_day",
+        "_unsaved",
+        "_dirty",
+    )
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.key_id = hashlib.sha256(key.encode()).hexdigest()[:12]
+        self.used = 0
+        self.cooldown_until = 0.0
+        self._day = _today()
+        # Запросы процесса, еще не добавленные к общему расходу в базе
+        self._unsaved = 0
+        self._dirty = False
+
+    def rollover(self) -> None:
+        """Обнуляет расход с началом новых суток."""
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self.used = 0
+            self._unsaved = 0
+            self._dirty = True
+
+    def remaining(self, limit: int) -> int:
+        """Возвращает остаток суточного лимита (0, если лимит не учитывается)."""
+        return max(limit - self.used, 0) if limit else 0
+
+    def available(self, now: float) -> bool:
+        """Ключ не отстранен."""
+        return now >= self.cooldown_until
+
+
+class ApiKeyPool:
+    """
+    Пул ключей API Кинопоиска.
+
+    Каждый запрос выполняется ключом с наибольшим остатком суточного лимита,
+    поэтому нагрузка распределяется между ключами равномерно. Ключ, получивший
+    ответ 401 или 403 (неверный ключ или исчерпан лимит), отстраняется до
+    начала следующих суток UTC, ответ 429 — на время из заголовка Retry-After
+    или на cooldown секунд.
+
+    Расход ключей общий для всех рабочих процессов: каждые FLUSH_INTERVAL
+    секунд процесс прибавляет к расходу в базе данных свои запросы с прошлого
+    сохранения и перечитывает общий расход и отстранения, сделанные другими
+    процессами. Поэтому выбор ключа учитывает запросы других процессов
+    с задержкой не больше FLUSH_INTERVAL. После перезапуска расход и
+    отстранения восстанавливаются из базы.
+
+    Атрибуты:
+        keys (list): Ключи пула.
+        limit (int): Суточный лимит запросов одного ключа (0 — не учитывать).
+        cooldown (float): Время отстранения ключа после ответа 429 без Retry-After.
+    """
+
+    def __init__(self, keys: Sequence[str], limit: int, cooldown: float) -> None:
+        self.keys: List[ApiKey] = [ApiKey(key) for key in dict.fromkeys(keys)]
+        self.limit = limit
+        self.cooldown = cooldown
+        # Сохранение в базу выполняется в пуле потоков, поэтому доступ защищен
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def acquire(self) -> ApiKey:
+        """
+        Выбирает ключ для запроса и учитывает запрос в его расходе.
+
+        :return: Доступный ключ с наибольшим остатком лимита.
+        :raises ApiKeysExhaustedError: Если все ключи отстранены.
+        """
+        now = time.time()
+        with self._lock:
+            candidates = []
+            for api_key in self.keys:
+                api_key.rollover()
+                if api_key.available(now):
+                    candidates.append(api_key)
+            if not candidates:
+                raise ApiKeysExhaustedError("All API keys are cooling down")
+            # При равном остатке (или без учета лимита) — наименее занятый ключ
+            api_key = max(
+                candidates,
+                key=lambda item: (item.remaining(self.limit), -item.used),
+            )
+            api_key.used += 1
+            api_key._unsaved += 1
+            api_key._dirty = True
+        return api_key
+
+    def report(
+        self, api_key: ApiKey, status: int, retry_after: Optional[str] = None
+    ) -> None:
+        """
+        Учитывает статус ответа: при 401, 403 и 429 отстраняет ключ.
+
+        :param api_key: Ключ, которым выполнен запрос.
+        :param status: HTTP-статус ответа.
+        :param retry_after: Значение заголовка Retry-After.
+        """
+        if status in (401, 403):
+            until = _next_day()
+        elif status == 429:
+            try:
+                until = time.time() + float(retry_after)
+            except (TypeError, ValueError):
+                until = time.time() + self.cooldown
+        else:
+            return
+
+        with self._lock:
+            api_key.cooldown_until = max(api_key.cooldown_until, until)
+            api_key._dirty = True
+        API_KEY_COOLDOWNS.inc(api_key.key_id, str(status))
+        logger.warning(
+            "API key %s got status %s and is cooling down for %.0f s",
+            api_key.key_id,
+            status,
+            until - time.time(),
+        )
+
+    def remaining(self) -> int:
+        """Возвращает суммарный остаток суточного лимита доступных ключей."""
+        now = time.time()
+        with self._lock:
+            total = 0
+            for api_key in self.keys:
+                api_key.rollover()
+                if api_key.available(now):
+                    total += api_key.remaining(self.limit)
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает остаток лимита каждого ключа (0 для отстраненных)."""
+        now = time.time()
+        with self._lock:
+            return {
+                api_key.key_id: (
+                    api_key.remaining(self.limit) if api_key.available(now) else 0
+                )
+                for api_key in self.keys
+            }
+
+    def load(self) -> None:
+        """Перечитывает из базы данных общий расход и отстранения ключей."""
+        by_id = {api_key.key_id: api_key for api_key in self.keys}
+        query = ApiKeyUsage.select().where(ApiKeyUsage.key_id.in_(list(by_id)))
+        records = list(query)
+        with self._lock:
+            for record in records:
+                api_key = by_id[record.key_id]
+                api_key.rollover()
+                if record.day == api_key._day:
+                    api_key.used = record.used + api_key._unsaved
+                api_key.cooldown_until = max(
+                    api_key.cooldown_until, record.cooldown_until or 0.0
+                )
+
+    def save(self) -> None:
+        """
+        Прибавляет к расходу ключей в базе данных запросы процесса с прошлого
+        сохранения, сохраняет отстранения и перечитывает общий расход.
+        """
+        with self._lock:
+            rows = []
+            for api_key in self.keys:
+                if api_key._dirty:
+                    api_key._dirty = False
+                    rows.append(
+                        {
+                            "key_id": api_key.key_id,
+                            "day": api_key._day,
+                            "used": api_key._unsaved,
+                            "cooldown_until": api_key.cooldown_until,
+                        }
+                    )
+                    api_key._unsaved = 0
+        if rows:
+            try:
+                ApiKeyUsage.insert_many(rows).on_conflict(
+                    conflict_target=[ApiKeyUsage.key_id],
+                    update={
+                        # Расход за те же сутки суммируется, с новыми сутками — начинается заново
+                        ApiKeyUsage.used: Case(
+                            None,
+                            [
+                                (
+                                    ApiKeyUsage.day == EXCLUDED.day,
+                                    ApiKeyUsage.used + EXCLUDED.used,
+                                )
+                            ],
+                            EXCLUDED.used,
+                        ),
+                        ApiKeyUsage.day: EXCLUDED.day,
+                        ApiKeyUsage.cooldown_until: Case(
+                            None,
+                            [
+                                (
+                                    EXCLUDED.cooldown_until
+                                    > ApiKeyUsage.cooldown_until,
+                                    EXCLUDED.cooldown_until,
+                                )
+                            ],
+                            ApiKeyUsage.cooldown_until,
+                        ),
+                    },
+                ).execute()
+            except Exception:
+                # Несохраненные запросы будут добавлены при следующем сохранении
+                by_id = {row["key_id"]: row for row in rows}
+                with self._lock:
+                    for api_key in self.keys:
+                        row = by_id.get(api_key.key_id)
+                        if row is not None and row["day"] == api_key._day:
+                            api_key._unsaved += row["used"]
+                            api_key._dirty = True
+                raise
+        self.load()
+
+    async def _flush(self) -> None:
+        try:
+            await run_db(self.save)
+        except Exception as e:
+            logger.error("Error saving API key usage: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self._flush()
+
+    async def start(self) -> None:
+        """Загружает расход ключей и запускает его периодическое сохранение."""
+        try:
+            await run_db(self.load)
+            logger.info("API key usage loaded for %d keys.", len(self.keys))
+        except Exception as e:
+            logger.error("Error loading API key usage: %s", e)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает периодическое сохранение и сохраняет расход ключей."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush()
+
+
+key_pool = ApiKeyPool(RAPID_API_KEYS, KINOPOISK_DAILY_LIMIT, API_KEY_COOLDOWN)
@@ -2,9 +2,11 @@ import logging.config
 
 import aiohttp
 
-from api import truncate_description
-from api.api import headers, url
+from api import quote_param, truncate_description
+from api.api import get_json, url
+from logger_helper.context import mark_api_failure, set_search_params
 from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.overload import overload_controller
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("movie_search_api")
@@ -18,51 +20,53 @@ async def search_movies(name: str, count: int) -> list:
     :param count: Количество вариантов для получения.
     :return: Текстовый ответ с найденными фильмами или сообщение об их отсутствии.
     """
-    url_name = f"{url}v1.4/movie/search?page=1&limit={count}&query={name}"
+    # При перегрузке запрашивается меньше результатов
+    count = overload_controller.cap_count(count)
+    set_search_params(count=count)
+
+    url_name = f"{url}v1.4/movie/search?page=1&limit={count}&query={quote_param(name)}"
 
     async with aiohttp.ClientSession() as session:
         try:
-            async with session.get(url_name, headers=headers) as response:
-                response.raise_for_status()
-                data = await response.json()
-                movies = data.get("docs", [])
+            data = await get_json(session, url_name)
+            movies = data.get("docs", [])
 
-                filtered_movies = [movie for movie in movies if movie.get("name")]
+            filtered_movies = [movie for movie in movies if movie.get("name")]
 
-                if filtered_movies:
-                    saved_movies = []
+            if filtered_movies:
+                saved_movies = []
 
-                    for movie in filtered_movies:
-                        genres = ", ".join(genre["name"] for genre in movie["genres"])
-                        description = truncate_description(
-                            movie["description"] or "Нет данных"
-                        )
-                        poster_data = movie.get("poster")
-                        poster_url = (
-                            poster_data.get("previewUrl")
-                            if poster_data
-                            else "Нет данных"
-                        )
-                        saved_movies.append(
-                            {
-                                "name": movie["name"],
-                                "description": description,
-                                "rating": movie.get("rating", {}).get(
-                                    "imdb",
-                                )
-                                or "Нет данных",
-                                "year": movie["year"] or "Нет данных",
-                                "genres": genres or "Нет данных",
-                                "ageRating": movie.get("ageRating") or "Нет данных",
-                                "poster_url": poster_url or "Нет данных",
-                            }
-                        )
-                    return saved_movies
-                else:
-                    return []
+                for movie in filtered_movies:
+                    genres = ", ".join(genre["name"] for genre in movie["genres"])
+                    description = truncate_description(
+                        movie["description"] or "Нет данных"
+                    )
+                    poster_data = movie.get("poster")
+                    poster_url = (
+                        poster_data.get("previewUrl") if poster_data else "Нет данных"
+                    )
+                    saved_movies.append(
+                        {
+                            "name": movie["name"],
+                            "description": description,
+                            "rating": movie.get("rating", {}).get(
+                                "imdb",
+                            )
+                            or "Нет данных",
+                            "year": movie["year"] or "Нет данных",
+                            "genres": genres or "Нет данных",
+                            "ageRating": movie.get("ageRating") or "Нет данных",
+                            "poster_url": poster_url or "Нет данных",
+                        }
+                    )
+                return saved_movies
+            else:
+                return []
         except aiohttp.ClientError as e:
             logger.error("API request error: %s", e)
+            mark_api_failure()
             return []
         except ValueError as e:
             logger.error("Data processing error: %s", e)
+            mark_api_failure()
             return []
@@ -0,0 +1,69 @@
+import logging.config
+import os
+
+from peewee import Database, SqliteDatabase
+from playhouse.db_url import parse
+from playhouse.pool import PooledPostgresqlDatabase
+
+from config_data.config import DATABASE_URL, DB_BACKEND, DB_POOL_SIZE, DB_POOL_TIMEOUT
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("database")
+
+db_directory = os.path.join(os.path.dirname(__file__), "data")
+
+
+def create_sqlite_database() -> Database:
+    """
+    Создает подключение к локальной базе SQLite (используется по умолчанию).
+
+    :return: Экземпляр SqliteDatabase.
+    """
+    os.makedirs(db_directory, exist_ok=True)
+    return SqliteDatabase(
+        os.path.join(db_directory, "movie_base.db"),
+        pragmas={"journal_mode": "wal", "synchronous": "normal"},
+    )
+
+
+def create_postgres_database() -> Database:
+    """
+    Создает пул подключений к PostgreSQL по адресу из DATABASE_URL.
+
+    Для работы требуется драйвер psycopg2 (pip install psycopg2-binary).
+
+    :return: Экземпляр PooledPostgresqlDatabase.
+    """
+    if not DATABASE_URL:
+        raise ValueError("Для DB_BACKEND=postgres необходимо указать DATABASE_URL")
+
+    return PooledPostgresqlDatabase(
+        max_connections=DB_POOL_SIZE,
+        stale_timeout=300,
+        timeout=DB_POOL_TIMEOUT,
+        **parse(DATABASE_URL),
+    )
+
+
+BACKENDS = {
+    "sqlite": create_sqlite_database,
+    "postgres": create_postgres_database,
+}
+
+
+def create_database() -> Database:
+    """
+    Создает базу данных для выбранного в настройках бэкенда (DB_BACKEND).
+
+    :return: Экземпляр базы данных peewee.
+    """
+    try:
+        factory = BACKENDS[DB_BACKEND]
+    except KeyError:
+        raise ValueError(
+            f"Неизвестный DB_BACKEND: {DB_BACKEND}. Допустимые значения: {', '.join(BACKENDS)}"
+        )
+
+    logger.info("Using %s database backend.", DB_BACKEND)
+    return factory()
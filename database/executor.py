@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from config_data.config import DB_POOL_SIZE
+from database.model import db
+from utils.metrics import registry
+from utils.tracing import tracer
+
+T = TypeVar("T")
+
+# Потоков не больше, чем подключений в пуле: каждый поток держит не более одного подключения
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+DB_DURATION = registry.histogram(
+    "db_operation_duration_seconds",
+    "Длительность операций с базой данных, включая получение подключения",
+    ["operation"],
+)
+
+# Тип базы данных для атрибутов спанов трассировки
+DB_SYSTEM = type(db).__name__
+
+
+def _call_with_connection(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполняет функцию в рамках подключения, которое затем возвращается в пул."""
+    operation = getattr(func, "__qualname__", type(func).__name__)
+    with tracer.span(f"db {operation}", **{"db.system": DB_SYSTEM}):
+        with DB_DURATION.time(operation):
+            with db.connection_context():
+                return func(*args, **kwargs)
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Выполняет синхронный запрос к базе данных в отдельном потоке,
+    не блокируя цикл событий.
+
+    :param func: Функция, обращающаяся к базе данных.
+    :param args: Позиционные аргументы функции.
+    :param kwargs: Именованные аргументы функции.
+    :return: Результат выполнения функции.
+    """
+    loop = asyncio.get_running_loop()
+    # Контекст (например, поля обновления для логов) переносится в поток запроса
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor,
+        functools.partial(context.run, _call_with_connection, func, *args, **kwargs),
+    )
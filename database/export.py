@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from tempfile import SpooledTemporaryFile
+from typing import Dict, Iterator, Tuple
+
+from database.model import History
+
+# Поля истории, попадающие в выгрузку
+EXPORT_FIELDS = (
+    "date",
+    "name",
+    "rating",
+    "year",
+    "genres",
+    "ageRating",
+    "poster_url",
+    "description",
+)
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# Размер выгрузки, после которого временный файл переносится из памяти на диск
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def iter_history(user_id: int, chunk_size: int = 500) -> Iterator[Dict[str, str]]:
+    """
+    Постранично перебирает всю историю пользователя, не загружая ее целиком в память.
+
+    Каждая порция выбирается по первичному ключу (keyset-пагинация), поэтому
+    скорость выборки не зависит от размера истории.
+
+    :param user_id: ID пользователя в Telegram.
+    :param chunk_size: Количество записей, выбираемых за один запрос.
+    :return: Итератор по записям истории в виде словарей.
+    """
+    fields = [getattr(History, name) for name in EXPORT_FIELDS]
+    last_id = 0
+
+    while True:
+        rows = list(
+            History.select(History.id, *fields)
+            .where((History.user == user_id) & (History.id > last_id))
+            .order_by(History.id)
+            .limit(chunk_size)
+            .dicts()
+        )
+        if not rows:
+            return
+
+        for row in rows:
+            last_id = row.pop("id")
+            row["date"] = row["date"].isoformat()
+            yield row
+
+
+def export_history(user_id: int, export_format: str) -> Tuple[SpooledTemporaryFile, int]:
+    """
+    Записывает историю пользователя во временный файл в формате CSV или JSONL.
+
+    :param user_id: ID пользователя в Telegram.
+    :param export_format: Формат выгрузки ('csv' или 'jsonl').
+    :return: Кортеж из временного файла, установленного на начало, и количества записей.
+        Файл закрывает вызывающий код; при ошибке выгрузки он закрывается сразу.
+    """
+    export_file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+    try:
+        text = io.TextIOWrapper(export_file, encoding="utf-8", newline="")
+        count = 0
+
+        if export_format == "csv":
+            writer = csv.DictWriter(text, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            for row in iter_history(user_id):
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in iter_history(user_id):
+                text.write(json.dumps(row, ensure_ascii=False))
+                text.write("\n")
+                count += 1
+
+        text.flush()
+        text.detach()
+    except BaseException:
+        # Файл не вернется вызывающему коду, поэтому закрывается здесь
+        export_file.close()
+        raise
+    export_file.seek(0)
+    return export_file, count
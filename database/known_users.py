@@ -0,0 +1,116 @@
+import logging.config
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config_data.config import KNOWN_USERS_CACHE_SIZE
+from database.model import User
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("database")
+
+
+class KnownUsers:
+    """
+    Кэш пользователей, которые уже сохранены в базе данных.
+
+    Позволяет не выполнять User.get_or_create при каждом поиске: запрос к базе
+    делается только для новых пользователей, а смена username записывается
+    при первом обращении пользователя с новым именем.
+    Размер кэша ограничен, при переполнении вытесняются давно не активные пользователи.
+
+    Атрибуты:
+        max_size (int): Максимальное количество пользователей в кэше.
+        hits (int): Количество обращений уже известных пользователей.
+        misses (int): Количество обращений, потребовавших запроса к базе данных.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._users: "OrderedDict[int, Optional[str]]" = OrderedDict()
+        # Запросы к базе выполняются в пуле потоков, поэтому доступ к кэшу защищен
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def warm_up(self) -> None:
+        """Заполняет кэш последними зарегистрированными пользователями из базы данных."""
+        try:
+            query = (
+                User.select(User.user_id, User.username)
+                .order_by(User.id.desc())
+                .limit(self.max_size)
+                .tuples()
+            )
+            for user_id, username in reversed(list(query)):
+                self._remember(user_id, username)
+            logger.info("Known users cache warmed up: %d users.", len(self._users))
+        except Exception as e:
+            logger.error("Error warming up known users cache: %s", e)
+
+    def known(self, user_id: int, username: Optional[str]) -> bool:
+        """
+        Проверяет по памяти процесса, что пользователь с этим именем уже сохранен.
+
+        Вызывается в цикле событий перед ensure: для известного пользователя
+        не нужны ни поток пула, ни подключение к базе данных.
+
+        :param user_id: ID пользователя в Telegram.
+        :param username: Текущее имя пользователя.
+        :return: True, если сохранять пользователя не нужно.
+        """
+        with self._lock:
+            if user_id not in self._users or self._users[user_id] != username:
+                return False
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return True
+
+    def ensure(self, user_id: int, username: Optional[str]) -> None:
+        """
+        Гарантирует, что пользователь сохранен в базе данных.
+
+        :param user_id: ID пользователя в Telegram.
+        :param username: Текущее имя пользователя.
+        """
+        with self._lock:
+            known = user_id in self._users
+            if known:
+                self._users.move_to_end(user_id)
+                if self._users[user_id] == username:
+                    self.hits += 1
+                    return
+            self.misses += 1
+
+        if known:
+            User.update(username=username).where(User.user_id == user_id).execute()
+            self._remember(user_id, username)
+            logger.debug("Username updated for user %s.", user_id)
+            return
+
+        user, created = User.get_or_create(
+            user_id=user_id, defaults={"username": username}
+        )
+        if not created and user.username != username:
+            User.update(username=username).where(User.user_id == user_id).execute()
+        if created:
+            logger.debug("New user %s saved to the database.", user_id)
+        self._remember(user_id, username)
+
+    def _remember(self, user_id: int, username: Optional[str]) -> None:
+        """Добавляет пользователя в кэш, вытесняя самых давних при переполнении."""
+        with self._lock:
+            self._users[user_id] = username
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+
+known_users = KnownUsers(KNOWN_USERS_CACHE_SIZE)
@@ -1,13 +1,21 @@
 import logging.config
 from logger_helper import LOGGING_CONFIG
-from datetime import date
-from peewee import Model, CharField, DateField, SqliteDatabase, TextField, IntegerField, ForeignKeyField
-import os
-
-db_directory = os.path.join(os.path.dirname(__file__), 'data')
-os.makedirs(db_directory, exist_ok=True)
-
-db = SqliteDatabase(os.path.join(db_directory, 'movie_base.db'))
+from datetime import date, datetime
+from peewee import (
+    BigIntegerField,
+    CharField,
+    DateField,
+    DateTimeField,
+    FloatField,
+    ForeignKeyField,
+    IntegerField,
+    Model,
+    TextField,
+    chunked,
+)
+from database.backends import create_database
+
+db = create_database()
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("database")
@@ -22,7 +30,7 @@ class User(Model):
         username (str): Имя пользователя
     """
 
-    user_id = IntegerField(unique=True)
+    user_id = BigIntegerField(unique=True)
     username = CharField(null=True)
 
     class Meta:
@@ -45,7 +53,7 @@ class History(Model):
         poster_url (str): URL постера фильма.
     """
 
-    user = ForeignKeyField(User, backref='searches')
+    user = ForeignKeyField(User, field=User.user_id, backref='searches')
     date = DateField(default=date.today)
     name = CharField()
     description = TextField()
@@ -58,6 +66,73 @@ class History(Model):
     class Meta:
         database = db
 
+    @classmethod
+    def save_movies(cls, user_id: int, movies: list) -> None:
+        """
+        Сохраняет найденные фильмы в историю одним пакетным запросом.
+
+        :param user_id: ID пользователя в Telegram.
+        :param movies: Список словарей с данными фильмов.
+        """
+        rows = [
+            {
+                "user": user_id,
+                "name": movie["name"],
+                "description": movie["description"],
+                "rating": movie["rating"],
+                "year": movie["year"],
+                "genres": movie["genres"],
+                "ageRating": movie["ageRating"],
+                "poster_url": movie["poster_url"],
+            }
+            for movie in movies
+        ]
+        with cls._meta.database.atomic():
+            for batch in chunked(rows, 100):
+                cls.insert_many(batch).execute()
+
+
+class PosterFileId(Model):
+    """
+    Модель для хранения file_id постеров, уже загруженных в Telegram.
+
+    Атрибуты:
+        poster_url (str): URL постера на Кинопоиске.
+        file_id (str): Идентификатор файла в Telegram.
+        used_at (datetime): Время последнего сохранения или чтения записи.
+    """
+
+    poster_url = CharField(unique=True)
+    file_id = CharField()
+    used_at = DateTimeField(default=datetime.now, index=True)
+
+    class Meta:
+        database = db
+
+
+class ApiKeyUsage(Model):
+    """
+    Модель для хранения расхода ключей API Кинопоиска.
+
+    Атрибуты:
+        key_id (str): Короткий хэш ключа (сам ключ в базе не хранится).
+        day (date): Сутки (UTC), к которым относится расход.
+        used (int): Количество запросов за эти сутки.
+        cooldown_until (float): Время (Unix), до которого ключ отстранен.
+    """
+
+    key_id = CharField(unique=True)
+    day = DateField()
+    used = IntegerField(default=0)
+    cooldown_until = FloatField(default=0)
+
+    class Meta:
+        database = db
+
+
+# Все модели базы данных в порядке создания таблиц
+MODELS = [User, History, PosterFileId, ApiKeyUsage]
+
 
 def initialize_database():
     """Инициализация базы данных и создание таблиц."""
@@ -66,7 +141,7 @@ def initialize_database():
         logger.info("Connected to the database.")
 
         # Создание таблиц, если они еще не существуют
-        db.create_tables([User, History], safe=True)
+        db.create_tables(MODELS, safe=True)
         logger.info("Tables created successfully.")
 
     except Exception as e:
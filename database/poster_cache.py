@@ -0,0 +1,137 @@
+import logging.config
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from config_data.config import POSTER_CACHE_SIZE
+from database.model import PosterFileId
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("database")
+
+
+class PosterCache:
+    """
+    Кэш file_id постеров, уже загруженных в Telegram.
+
+    После первой отправки постера по URL Telegram возвращает file_id, по которому
+    тот же файл отправляется повторно без загрузки с CDN Кинопоиска. Соответствие
+    URL -> file_id хранится в базе данных и в памяти процесса. Размер кэша
+    ограничен: в памяти вытесняются давно не использованные постеры, в базе
+    удаляются записи с самым старым временем использования.
+
+    Атрибуты:
+        max_size (int): Максимальное количество хранимых постеров.
+        hits (int): Количество найденных file_id.
+        misses (int): Количество постеров, которых нет в кэше.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._file_ids: "OrderedDict[str, str]" = OrderedDict()
+        # Запросы к базе выполняются в пуле потоков, поэтому доступ к кэшу защищен
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._file_ids)
+
+    def warm_up(self) -> None:
+        """Заполняет кэш последними использованными постерами из базы данных."""
+        try:
+            query = (
+                PosterFileId.select(PosterFileId.poster_url, PosterFileId.file_id)
+                .order_by(PosterFileId.used_at.desc())
+                .limit(self.max_size)
+                .tuples()
+            )
+            for poster_url, file_id in reversed(list(query)):
+                self._remember(poster_url, file_id)
+            logger.info("Poster cache warmed up: %d posters.", len(self._file_ids))
+        except Exception as e:
+            logger.error("Error warming up poster cache: %s", e)
+
+    def cached(self, poster_url: str) -> Optional[str]:
+        """
+        Возвращает file_id постера из памяти процесса.
+
+        :param poster_url: URL постера.
+        :return: file_id или None, если постера нет в памяти.
+        """
+        with self._lock:
+            file_id = self._file_ids.get(poster_url)
+            if file_id is not None:
+                self._file_ids.move_to_end(poster_url)
+                self.hits += 1
+        return file_id
+
+    def fetch(self, poster_url: str) -> Optional[str]:
+        """
+        Ищет file_id постера в памяти, а затем в базе данных.
+
+        :param poster_url: URL постера.
+        :return: file_id или None, если постер еще не отправлялся.
+        """
+        file_id = self.cached(poster_url)
+        if file_id is not None:
+            return file_id
+
+        record = PosterFileId.get_or_none(PosterFileId.poster_url == poster_url)
+        if record is None:
+            self.misses += 1
+            return None
+
+        PosterFileId.update(used_at=datetime.now()).where(
+            PosterFileId.id == record.id
+        ).execute()
+        self.hits += 1
+        self._remember(poster_url, record.file_id)
+        return record.file_id
+
+    def save(self, poster_url: str, file_id: str) -> None:
+        """
+        Сохраняет file_id постера и удаляет лишние записи из базы данных.
+
+        :param poster_url: URL постера.
+        :param file_id: Идентификатор файла в Telegram.
+        """
+        self._remember(poster_url, file_id)
+        PosterFileId.insert(
+            poster_url=poster_url, file_id=file_id, used_at=datetime.now()
+        ).on_conflict(
+            conflict_target=[PosterFileId.poster_url],
+            preserve=[PosterFileId.file_id, PosterFileId.used_at],
+        ).execute()
+
+        oldest = (
+            PosterFileId.select(PosterFileId.id)
+            .order_by(PosterFileId.used_at.desc())
+            .offset(self.max_size)
+        )
+        removed = PosterFileId.delete().where(PosterFileId.id.in_(oldest)).execute()
+        if removed:
+            logger.debug("Removed %d old posters from the cache.", removed)
+
+    def forget(self, poster_url: str) -> None:
+        """
+        Удаляет постер, file_id которого Telegram больше не принимает.
+
+        :param poster_url: URL постера.
+        """
+        with self._lock:
+            self._file_ids.pop(poster_url, None)
+        PosterFileId.delete().where(PosterFileId.poster_url == poster_url).execute()
+
+    def _remember(self, poster_url: str, file_id: str) -> None:
+        """Добавляет постер в память, вытесняя давно не использованные при переполнении."""
+        with self._lock:
+            self._file_ids[poster_url] = file_id
+            self._file_ids.move_to_end(poster_url)
+            while len(self._file_ids) > self.max_size:
+                self._file_ids.popitem(last=False)
+
+
+poster_cache = PosterCache(POSTER_CACHE_SIZE)
@@ -2,7 +2,9 @@ __all__ = ("router",)
 
 from aiogram import Router
 
+from .admin import router as admin
 from .callback import router as callback
+from .export_history import router as export_history
 from .handlers_main import router as handlers
 from .high_budget_movie import router as high_budget_movie
 from .history import router as history
@@ -12,6 +14,8 @@ from .movie_by_rating import router as movie_by_rating
 from .movie_search import router as movie_search
 
 router = Router(name=__name__)
+# Команды администраторов обрабатываются раньше состояний диалогов
+router.include_router(admin)
 router.include_router(handlers)
 router.include_router(callback)
 router.include_router(movie_search)
@@ -20,3 +24,4 @@ router.include_router(movie_by_rating)
 router.include_router(low_budget_movie)
 router.include_router(high_budget_movie)
 router.include_router(history)
+router.include_router(export_history)
@@ -0,0 +1,143 @@
+import asyncio
+import logging.config
+import os
+from typing import Set
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile
+
+from config_data.config import (
+    ADMIN_IDS,
+    PROFILE_DIR,
+    PROFILE_MAX_SECONDS,
+    PROFILE_SAMPLE_INTERVAL,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.profiler import (
+    PROFILE_MODES,
+    ProfileSession,
+    memory_snapshot,
+    stop_memory_tracing,
+)
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("admin")
+
+router = Router(name=__name__)
+# Команды доступны только пользователям из ADMIN_IDS, сообщения остальных
+# проходят дальше, как будто команд не существует
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+# Фоновые задачи профилирования: ссылки хранятся, чтобы задачи не были удалены
+_profile_tasks: Set[asyncio.Task] = set()
+
+DEFAULT_PROFILE_SECONDS = 30
+
+
+async def _profile_and_report(message: types.Message, session: ProfileSession) -> None:
+    """Выполняет профилирование и отправляет отчет и файл профиля."""
+    try:
+        report, path = await session.run()
+    except Exception as e:
+        logger.error("Profiling failed: %s", e)
+        await message.answer(f"Ошибка профилирования: {e}")
+        return
+
+    logger.info("Profile saved to %s", path)
+    await message.answer(report)
+    await message.answer_document(
+        FSInputFile(path, filename=os.path.basename(path)),
+        caption=(
+            "Свернутые стеки для flamegraph.pl или speedscope"
+            if session.mode == "sample"
+            else "Файл pstats для snakeviz или flameprof"
+        ),
+    )
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: types.Message, command: CommandObject) -> None:
+    """
+    Обработчик команды /profile [секунды] [sample|cprofile].
+    Запускает профилирование бота; по окончании отправляет самые затратные
+    функции и файл профиля.
+
+    :param message: Сообщение, содержащее команду от администратора.
+    :param command: Аргументы команды: длительность и режим профилирования.
+    """
+    seconds = DEFAULT_PROFILE_SECONDS
+    mode = "sample"
+    for arg in (command.args or "").split():
+        if arg.isdigit():
+            seconds = min(int(arg), PROFILE_MAX_SECONDS)
+        elif arg.lower() in PROFILE_MODES:
+            mode = arg.lower()
+        else:
+            await message.reply(
+                "Использование: /profile [секунды] [sample|cprofile]", parse_mode=None
+            )
+            return
+
+    if ProfileSession.active is not None:
+        await message.reply("Профилирование уже выполняется: /profile_stop")
+        return
+
+    session = ProfileSession(mode, seconds, PROFILE_SAMPLE_INTERVAL, PROFILE_DIR)
+    task = asyncio.create_task(_profile_and_report(message, session))
+    _profile_tasks.add(task)
+    task.add_done_callback(_profile_tasks.discard)
+    logger.info(
+        "Profiling (%s, %d s) started by %s", mode, seconds, message.from_user.id
+    )
+    await message.reply(
+        f"Профилирование ({mode}) запущено на {seconds} с. "
+        "Досрочно завершить: /profile_stop",
+        parse_mode=None,
+    )
+
+
+@router.message(Command("profile_stop"))
+async def cmd_profile_stop(message: types.Message) -> None:
+    """
+    Обработчик команды /profile_stop.
+    Досрочно завершает профилирование; отчет отправляется как обычно.
+
+    :param message: Сообщение, содержащее команду от администратора.
+    """
+    session = ProfileSession.active
+    if session is None:
+        await message.reply("Профилирование не выполняется.")
+        return
+    session.stop()
+
+
+@router.message(Command("memory"))
+async def cmd_memory(message: types.Message, command: CommandObject) -> None:
+    """
+    Обработчик команды /memory [stop].
+    Отправляет срез выделенной памяти tracemalloc по пакетам и файлам.
+    Первый вызов запускает отслеживание, /memory stop — останавливает.
+
+    :param message: Сообщение, содержащее команду от администратора.
+    :param command: Аргументы команды.
+    """
+    if (command.args or "").strip().lower() == "stop":
+        stopped = stop_memory_tracing()
+        await message.reply(
+            "Отслеживание памяти остановлено."
+            if stopped
+            else "Отслеживание памяти не запущено."
+        )
+        return
+
+    report = await asyncio.to_thread(memory_snapshot)
+    if report is None:
+        logger.info("Memory tracing started by %s", message.from_user.id)
+        await message.reply(
+            "Отслеживание памяти запущено. Повторите /memory, когда бот "
+            "поработает под нагрузкой; /memory stop — остановить.",
+            parse_mode=None,
+        )
+        return
+    await message.answer(report, parse_mode=None)
@@ -1,17 +1,35 @@
+import asyncio
 import logging.config
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from aiogram import Router, types
-from aiogram.exceptions import TelegramServerError
+from aiogram import F, Router, types
+from aiogram.exceptions import TelegramBadRequest, TelegramServerError
 from aiogram.fsm.context import FSMContext
+from aiogram.types import InputMediaPhoto
 
 import keyboards.inline as kbi
+from database.executor import run_db
+from database.poster_cache import poster_cache
+from keyboards.callback_data import (
+    CallbackDataIs,
+    CallbackDataMiddleware,
+    Navigate,
+    SelectMovie,
+)
+from logger_helper.context import stale_response_served
 from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.paginator import Paginator, load_paginator, save_paginator
+from utils.throttling import refund_throttle
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("callback_logger")
 
+# Пометка к результатам поиска, полученным из кэша при сбое API
+STALE_DATA_NOTE = "\n\n_Данные могут быть устаревшими_"
+
 router = Router(name=__name__)
+# Данные кнопки разбираются один раз, фильтры обработчиков только сверяют их тип
+router.callback_query.outer_middleware(CallbackDataMiddleware())
 
 
 def format_movie_message(movie: Dict[str, Optional[str]]) -> str:
@@ -40,7 +58,7 @@ def generate_response_message(paginator) -> str:
     :return: Форматированное сообщение о фильмах.
     """
     current_movies = paginator.get_current()
-    return "\n\n".join(
+    return f"Найдено фильмов: {len(paginator.items)}\n\n" + "\n\n".join(
         [
             f"{index + 1 + (paginator.current_page - 1) * paginator.items_per_page}. {movie['name']}\n"
             f"IMDb: {movie['rating']} | "
@@ -51,38 +69,136 @@ def generate_response_message(paginator) -> str:
     )
 
 
-@router.callback_query(lambda c: c.data.startswith("select_movie:"))
+async def answer_search_results(
+    message: types.Message, state: FSMContext, movies: List[dict]
+) -> None:
+    """
+    Отправляет первую страницу результатов поиска одним сообщением
+    и сохраняет пагинацию в FSM.
+
+    :param message: Сообщение пользователя, на которое отправляется ответ.
+    :param state: Контекст состояния FSM.
+    :param movies: Найденные фильмы.
+    """
+    paginator = Paginator(movies, items_per_page=6)
+    await state.clear()
+    await save_paginator(state, paginator)
+    text = generate_response_message(paginator)
+    if stale_response_served():
+        text += STALE_DATA_NOTE
+    await message.answer(
+        text,
+        reply_markup=kbi.get_movie_selection_keyboard(
+            paginator.get_current(), paginator.current_page, paginator.result_id
+        ),
+        parse_mode="Markdown",
+    )
+
+
+async def _show_poster(
+    message: types.Message,
+    photo: str,
+    caption: str,
+    carousel_id: Optional[int],
+) -> types.Message:
+    if carousel_id is None:
+        return await message.answer_photo(
+            photo=photo, caption=caption, parse_mode="Markdown"
+        )
+    return await message.bot.edit_message_media(
+        chat_id=message.chat.id,
+        message_id=carousel_id,
+        media=InputMediaPhoto(media=photo, caption=caption, parse_mode="Markdown"),
+    )
+
+
+async def answer_with_poster(
+    message: types.Message, state: FSMContext, poster_url: str, caption: str
+) -> None:
+    """
+    Показывает описание фильма с постером.
+
+    Постеры выбранных фильмов сменяют друг друга в одном сообщении: если оно
+    уже есть, его содержимое заменяется через edit_message_media, иначе
+    отправляется новое сообщение. Постер, который уже отправлялся,
+    отправляется повторно по file_id без загрузки с CDN. Если Telegram не
+    принимает file_id или не может загрузить постер по URL, используется
+    следующий вариант: URL, затем только текст.
+
+    :param message: Сообщение, в чат которого отправляется ответ.
+    :param state: Контекст состояния FSM.
+    :param poster_url: URL постера.
+    :param caption: Описание фильма.
+    """
+    carousel_id = (await state.get_data()).get("poster_message_id")
+    file_id = poster_cache.cached(poster_url) or await run_db(
+        poster_cache.fetch, poster_url
+    )
+
+    attempts = [(photo, carousel_id) for photo in (file_id, poster_url) if photo]
+    if carousel_id is not None:
+        # Сообщение с постером могло быть удалено: тогда отправляется новое
+        attempts += [(photo, None) for photo in (file_id, poster_url) if photo]
+
+    for photo, message_id in attempts:
+        try:
+            sent = await _show_poster(message, photo, caption, message_id)
+            break
+        except TelegramBadRequest as e:
+            if "message is not modified" in e.message:
+                return
+            logger.warning("Failed to show poster %s: %s", photo, e)
+    else:
+        if file_id is not None:
+            await run_db(poster_cache.forget, poster_url)
+        await message.answer(caption, parse_mode="Markdown")
+        return
+
+    if isinstance(sent, types.Message) and sent.photo:
+        if sent.photo[-1].file_id != file_id:
+            await run_db(poster_cache.save, poster_url, sent.photo[-1].file_id)
+        await state.update_data(poster_message_id=sent.message_id)
+
+
+@router.callback_query(CallbackDataIs(SelectMovie), flags={"throttle": "paging"})
 async def process_movie_selection(
-    callback_query: types.CallbackQuery, state: FSMContext
+    callback_query: types.CallbackQuery, state: FSMContext, callback_data: SelectMovie
 ):
-    data = await state.get_data()
-    paginator = data.get("paginator")
+    paginator = await load_paginator(state)
 
     if paginator is None:
         await callback_query.answer(
             "Кнопка недоступна. Нажмите 'На главную'", show_alert=True
         )
+        refund_throttle()
         logger.warning("Paginator is None.")
         return
 
     try:
-        selected_index = int(callback_query.data.split(":")[1])
-        selected_movie = paginator.items[selected_index]
+        selected_movie = paginator.items[callback_data.index]
 
         response_message = format_movie_message(selected_movie)
 
-        await callback_query.answer(f"Вы выбрали фильм {selected_movie['name']}")
-
         poster_url = selected_movie.get("poster_url")
 
         if poster_url and (
             poster_url.startswith("http:") or poster_url.startswith("https:")
         ):
-            await callback_query.message.answer_photo(
-                photo=poster_url, caption=response_message, parse_mode="Markdown"
+            send = answer_with_poster(
+                callback_query.message, state, poster_url, response_message
             )
         else:
-            await callback_query.message.answer(response_message, parse_mode="Markdown")
+            send = callback_query.message.answer(
+                response_message, parse_mode="Markdown"
+            ).emit(callback_query.bot)
+
+        # Ответ на нажатие кнопки отправляется одновременно с описанием фильма
+        await asyncio.gather(
+            callback_query.answer(f"Вы выбрали фильм {selected_movie['name']}").emit(
+                callback_query.bot
+            ),
+            send,
+        )
 
         logger.info(
             "User %s selected movie '%s'",
@@ -107,7 +223,9 @@ async def process_movie_selection(
         )
 
 
-@router.callback_query(lambda c: c.data.startswith("navigate:next:"))
+@router.callback_query(
+    CallbackDataIs(Navigate, F.direction == "next"), flags={"throttle": "paging"}
+)
 async def process_page_next(callback_query: types.CallbackQuery, state: FSMContext):
     """
     Обработчик нажатия кнопки 'Дальше' для навигации по страницам результатов.
@@ -117,13 +235,13 @@ async def process_page_next(callback_query: types.CallbackQuery, state: FSMConte
     """
     logging.info("Next button pressed by user %s", callback_query.from_user.full_name)
 
-    data = await state.get_data()
-    paginator = data.get("paginator")
+    paginator = await load_paginator(state)
 
     if paginator is None:
         await callback_query.answer(
             "Кнопка недоступна. Нажмите 'На главную'", show_alert=True
         )
+        refund_throttle()
         logger.warning("NoneType object has no attribute get_current")
         return
 
@@ -131,15 +249,20 @@ async def process_page_next(callback_query: types.CallbackQuery, state: FSMConte
         if paginator.has_next():
             paginator.next()
 
-            await state.update_data(paginator=paginator)
+            await save_paginator(state, paginator)
 
             response_message = generate_response_message(paginator)
 
-            await callback_query.message.edit_text(
-                response_message,
-                reply_markup=kbi.get_movie_selection_keyboard(
-                    paginator.get_current(), paginator.current_page
-                ),
+            await asyncio.gather(
+                callback_query.message.edit_text(
+                    response_message,
+                    reply_markup=kbi.get_movie_selection_keyboard(
+                        paginator.get_current(),
+                        paginator.current_page,
+                        paginator.result_id,
+                    ),
+                ).emit(callback_query.bot),
+                callback_query.answer().emit(callback_query.bot),
             )
 
             logger.info(
@@ -157,7 +280,9 @@ async def process_page_next(callback_query: types.CallbackQuery, state: FSMConte
         logger.error("Error occurred while navigating to next page: %s", e)
 
 
-@router.callback_query(lambda c: c.data.startswith("navigate:previous:"))
+@router.callback_query(
+    CallbackDataIs(Navigate, F.direction == "previous"), flags={"throttle": "paging"}
+)
 async def process_page_back(callback_query: types.CallbackQuery, state: FSMContext):
     """
     Обработчик нажатия кнопки 'Назад' для навигации по страницам результатов.
@@ -169,13 +294,13 @@ async def process_page_back(callback_query: types.CallbackQuery, state: FSMConte
         "Previous button pressed by user %s", callback_query.from_user.full_name
     )
 
-    data = await state.get_data()
-    paginator = data.get("paginator")
+    paginator = await load_paginator(state)
 
     if paginator is None:
         await callback_query.answer(
             "Кнопка недоступна. Нажмите 'На главную'", show_alert=True
         )
+        refund_throttle()
         logger.warning("NoneType object has no attribute get_current")
         return
 
@@ -183,16 +308,20 @@ async def process_page_back(callback_query: types.CallbackQuery, state: FSMConte
         if paginator.has_previous():
             paginator.previous()
 
-            await state.update_data(paginator=paginator)
+            await save_paginator(state, paginator)
 
             response_message = generate_response_message(paginator)
 
-            await callback_query.message.edit_text(
-                response_message,
-                reply_markup=kbi.get_movie_selection_keyboard(
-                    paginator.get_current(),
-                    paginator.current_page,
-                ),
+            await asyncio.gather(
+                callback_query.message.edit_text(
+                    response_message,
+                    reply_markup=kbi.get_movie_selection_keyboard(
+                        paginator.get_current(),
+                        paginator.current_page,
+                        paginator.result_id,
+                    ),
+                ).emit(callback_query.bot),
+                callback_query.answer().emit(callback_query.bot),
             )
             logger.info(
                 "User %s navigated to page %d",
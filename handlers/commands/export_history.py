@@ -0,0 +1,91 @@
+import logging.config
+from datetime import date
+from typing import AsyncGenerator, BinaryIO
+
+from aiogram import Bot, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import InputFile
+
+import keyboards.reply as kbr
+from database.executor import run_db
+from database.export import EXPORT_FORMATS, export_history
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("export_history")
+
+router = Router(name=__name__)
+
+
+class SpooledInputFile(InputFile):
+    """
+    Файл для отправки в Telegram, читаемый по частям из открытого файлового объекта.
+
+    В отличие от BufferedInputFile не требует загружать содержимое в память целиком.
+    """
+
+    def __init__(self, file: BinaryIO, filename: str, **kwargs) -> None:
+        super().__init__(filename=filename, **kwargs)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+@router.message(Command("export_history"), flags={"throttle": "export"})
+async def cmd_export_history(message: types.Message, command: CommandObject) -> None:
+    """
+    Обработчик команды /export_history.
+    Отправляет пользователю всю историю поиска файлом в формате CSV или JSONL.
+
+    :param message: Сообщение, содержащее команду от пользователя.
+    :param command: Аргументы команды (формат выгрузки, по умолчанию csv).
+    """
+    export_format = (command.args or "csv").strip().lower()
+
+    if export_format not in EXPORT_FORMATS:
+        await message.reply(
+            "Поддерживаемые форматы выгрузки: " + ", ".join(EXPORT_FORMATS)
+        )
+        return
+
+    try:
+        export_file, count = await run_db(
+            export_history, message.from_user.id, export_format
+        )
+    except Exception as e:
+        logger.error(
+            "Error exporting history for user %s: %s", message.from_user.full_name, e
+        )
+        await message.answer(
+            "Произошла ошибка при выгрузке истории. Пожалуйста, попробуйте позже.",
+            reply_markup=kbr.main,
+        )
+        return
+
+    try:
+        if not count:
+            await message.answer("История поиска пуста.", reply_markup=kbr.main)
+            return
+
+        filename = f"history_{date.today().isoformat()}.{export_format}"
+        await message.answer_document(
+            SpooledInputFile(export_file, filename=filename),
+            caption=f"История поиска: {count} записей",
+        )
+        logger.info(
+            "History exported for user %s: %d records, format %s",
+            message.from_user.full_name,
+            count,
+            export_format,
+        )
+    except Exception as e:
+        logger.error(
+            "Error sending history export to user %s: %s",
+            message.from_user.full_name,
+            e,
+        )
+    finally:
+        export_file.close()
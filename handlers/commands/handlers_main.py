@@ -5,7 +5,8 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
 import keyboards.reply as kbr
-from database.model import User
+from database.executor import run_db
+from database.known_users import known_users
 from logger_helper.logger_helper import LOGGING_CONFIG
 
 logging.config.dictConfig(LOGGING_CONFIG)
@@ -25,7 +26,8 @@ async def cmd_start(message: types.Message) -> None:
     user_id = message.from_user.id
     username = message.from_user.username
     try:
-        User.get_or_create(user_id=user_id, defaults={"username": username})
+        if not known_users.known(user_id, username):
+            await run_db(known_users.ensure, user_id, username)
         await message.answer(
             text="Добро пожаловать в Kinopoisk!\n"
             "Все топовые новинки, сериалы, аниме, мультфильмы найдете у нас 😉",
@@ -78,7 +80,8 @@ async def cmd_help(message: types.Message, state: FSMContext):
             "/movie_by_rating - Поиск фильмов/сериалов по рейтингу\n"
             "/low_budget_movie - Поиск фильмов/сериалов с низким бюджетом\n"
             "/high_budget_movie - Поиск фильмов/сериалов с высоким бюджетом\n"
-            "/history - История запросов"
+            "/history - История запросов\n"
+            "/export_history - Выгрузка всей истории (csv или jsonl)"
         )
         logger.debug(
             "Command help processed successfully for user: %s",
@@ -5,14 +5,17 @@ from aiogram import F, Router, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
-import keyboards.inline as kbi
 import keyboards.reply as kbr
 from api.high_budget_movie_api import high_budget_movie
-from database.model import History, User
-from handlers.commands.callback import generate_response_message
+from database.executor import run_db
+from database.known_users import known_users
+from database.model import History
+from handlers.commands.callback import answer_search_results
+from logger_helper.context import api_request_failed
 from logger_helper.logger_helper import LOGGING_CONFIG
 from state.states import HighBudget
-from utils.paginator import Paginator
+from utils.overload import OVERLOAD_MESSAGE, OverloadedError
+from utils.throttling import refund_throttle
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("high_budget_movie")
@@ -132,9 +135,7 @@ async def ask_genre_response(message: types.Message, state: FSMContext) -> None:
         user_response = message.text.lower()
 
         if user_response == "да":
-            await message.answer(
-                "Выберите жанр:", reply_markup=await kbr.reply_genres()
-            )
+            await message.answer("Выберите жанр:", reply_markup=kbr.genres_keyboard)
             await state.set_state(HighBudget.genre)
             logger.info("The user has selected: 'Yes' for the genre selection.")
         elif user_response == "нет":
@@ -205,7 +206,7 @@ async def validate_count(count: int) -> Optional[str]:
     return None
 
 
-@router.message(HighBudget.count)
+@router.message(HighBudget.count, flags={"search": True, "throttle": "search"})
 async def process_count(message: types.Message, state: FSMContext) -> None:
     """
     Обработчик ввода количества вариантов фильмов для отображения.
@@ -223,6 +224,7 @@ async def process_count(message: types.Message, state: FSMContext) -> None:
 
         if validation_error:
             await message.reply(validation_error)
+            refund_throttle()
             logger.warning(
                 "User %s entered an invalid count: %s",
                 message.from_user.full_name,
@@ -239,6 +241,9 @@ async def process_count(message: types.Message, state: FSMContext) -> None:
             await message.answer(
                 "К сожалению, ничего не найдено.", reply_markup=kbr.main
             )
+            if api_request_failed():
+                # Пустой ответ из-за ошибки API: поиск не засчитывается
+                refund_throttle()
             logger.info(
                 "No movies found for user %s with budget '%s'",
                 message.from_user.full_name,
@@ -246,45 +251,32 @@ async def process_count(message: types.Message, state: FSMContext) -> None:
             )
             return
 
-        User.get_or_create(
-            user_id=message.from_user.id,
-            defaults={"username": message.from_user.username},
-        )
-        for movie in movies:
-            History.create(
-                user_id=message.from_user.id,
-                name=movie["name"],
-                description=movie["description"],
-                rating=movie["rating"],
-                year=movie["year"],
-                genres=movie["genres"],
-                ageRating=movie["ageRating"],
-                poster_url=movie["poster_url"],
+        if not known_users.known(message.from_user.id, message.from_user.username):
+            await run_db(
+                known_users.ensure, message.from_user.id, message.from_user.username
             )
+        await run_db(History.save_movies, message.from_user.id, movies)
 
-        paginator = Paginator(movies, items_per_page=6)
-        response_message = generate_response_message(paginator)
-
-        await message.answer(f"Найдено фильмов: {len(movies)}")
-        await message.answer(
-            response_message,
-            reply_markup=kbi.get_movie_selection_keyboard(
-                paginator.get_current(), paginator.current_page
-            ),
-            parse_mode="Markdown",
-        )
-        await state.clear()
-        await state.update_data(paginator=paginator)
+        await answer_search_results(message, state, movies)
         logger.debug(
             "Successfully processed movie count input for user %s",
             message.from_user.full_name,
         )
     except ValueError:
         await message.reply("Пожалуйста, введите корректное число.")
+        refund_throttle()
         logger.error(
             "ValueError for user %s: Invalid input '%s'",
             message.from_user.full_name,
             message.text,
         )
+    except OverloadedError:
+        await message.answer(OVERLOAD_MESSAGE)
+        refund_throttle()
+        logger.warning(
+            "Search for user %s skipped: overloaded and no cached response",
+            message.from_user.full_name,
+        )
     except Exception as e:
         logger.error("Error processing movie budget input: %s", e)
+        refund_throttle()
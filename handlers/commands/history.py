@@ -5,13 +5,13 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
-import keyboards.inline as kbi
 import keyboards.reply as kbr
+from database.executor import run_db
 from database.model import History
-from handlers.commands.callback import generate_response_message
+from handlers.commands.callback import answer_search_results
 from logger_helper.logger_helper import LOGGING_CONFIG
 from state.states import HistoryState
-from utils.paginator import Paginator
+from utils.throttling import refund_throttle
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("history")
@@ -45,7 +45,7 @@ async def cmd_history(message: types.Message, state: FSMContext) -> None:
         )
 
 
-@router.message(HistoryState.history)
+@router.message(HistoryState.history, flags={"throttle": "history"})
 async def process_date(message: types.Message, state: FSMContext) -> None:
     """
     Обработчик ввода даты.
@@ -59,6 +59,7 @@ async def process_date(message: types.Message, state: FSMContext) -> None:
 
         if input_date > datetime.now().date():
             await message.reply("Пожалуйста, введите дату не позже сегодняшнего дня.")
+            refund_throttle()
             return
 
         results = (
@@ -69,7 +70,7 @@ async def process_date(message: types.Message, state: FSMContext) -> None:
             .dicts()
         )
 
-        movies = list(results)
+        movies = await run_db(list, results)
 
         if not movies:
             await message.answer(
@@ -82,19 +83,7 @@ async def process_date(message: types.Message, state: FSMContext) -> None:
             )
             return
 
-        paginator = Paginator(movies, items_per_page=6)
-        response_message = generate_response_message(paginator)
-
-        await message.answer(f"Найдено фильмов: {len(movies)}")
-        await message.answer(
-            response_message,
-            reply_markup=kbi.get_movie_selection_keyboard(
-                paginator.get_current(), paginator.current_page
-            ),
-            parse_mode="Markdown",
-        )
-        await state.clear()
-        await state.update_data(paginator=paginator)
+        await answer_search_results(message, state, movies)
         logger.debug(
             "Successfully processed date input for user %s", message.from_user.full_name
         )
@@ -102,6 +91,7 @@ async def process_date(message: types.Message, state: FSMContext) -> None:
         await message.reply(
             "Пожалуйста, введите дату в корректном формате (ГГГГ-ММ-ДД)."
         )
+        refund_throttle()
     except Exception as e:
         logger.error(
             "Error processing date input for user %s",
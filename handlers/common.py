@@ -30,7 +30,8 @@ async def unknown_message(message: types.Message, state: FSMContext) -> None:
             "/movie_by_rating - Поиск фильмов/сериалов по рейтингу\n"
             "/low_budget_movie - Поиск фильмов/сериалов с низким бюджетом\n"
             "/high_budget_movie - Поиск фильмов/сериалов с высоким бюджетом\n"
-            "/history - История запросов",
+            "/history - История запросов\n"
+            "/export_history - Выгрузка всей истории (csv или jsonl)",
             parse_mode=None,
         )
         logger.debug(
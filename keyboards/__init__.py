@@ -1,2 +1,3 @@
-from .reply import main, cancel, to_main, genres, reply_genres, main_menu_keyboard
-from .inline import get_movie_selection_keyboard
\ No newline at end of file
+from .reply import main, cancel, to_main, genres, reply_genres, genres_keyboard, main_menu_keyboard
+from .inline import get_movie_selection_keyboard, keyboard_cache
+from .callback_data import SelectMovie, Navigate
\ No newline at end of file
@@ -0,0 +1,86 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Type, Union
+
+from aiogram import BaseMiddleware
+from aiogram.filters import Filter
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, TelegramObject
+from magic_filter import MagicFilter
+
+
+class SelectMovie(CallbackData, prefix="select_movie"):
+    """Выбор фильма из списка результатов: select_movie:<индекс>."""
+
+    index: int
+
+
+class Navigate(CallbackData, prefix="navigate"):
+    """Переход по страницам результатов: navigate:<next|previous>:<страница>."""
+
+    direction: str
+    page: int
+
+
+# Префикс -> фабрика данных кнопок
+CALLBACK_DATA: Dict[str, Type[CallbackData]] = {
+    factory.__prefix__: factory for factory in (SelectMovie, Navigate)
+}
+
+
+def parse_callback_data(data: Optional[str]) -> Optional[CallbackData]:
+    """
+    Разбирает данные кнопки по префиксу.
+
+    :param data: Данные кнопки из CallbackQuery.
+    :return: Экземпляр фабрики данных или None, если данные не распознаны.
+    """
+    if not data:
+        return None
+    factory = CALLBACK_DATA.get(data.partition(":")[0])
+    if factory is None:
+        return None
+    try:
+        return factory.unpack(data)
+    except (TypeError, ValueError):
+        return None
+
+
+class CallbackDataMiddleware(BaseMiddleware):
+    """
+    Middleware, разбирающее данные кнопки один раз до проверки фильтров.
+
+    Фабрика выбирается по префиксу из словаря, результат передается
+    обработчикам и фильтрам в аргументе callback_data.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, CallbackQuery):
+            data["callback_data"] = parse_callback_data(event.data)
+        return await handler(event, data)
+
+
+class CallbackDataIs(Filter):
+    """
+    Фильтр по типу разобранных данных кнопки и, при необходимости, по их полям.
+
+    Требует подключенного CallbackDataMiddleware.
+    """
+
+    __slots__ = ("factory", "rule")
+
+    def __init__(
+        self, factory: Type[CallbackData], rule: Optional[MagicFilter] = None
+    ) -> None:
+        self.factory = factory
+        self.rule = rule
+
+    async def __call__(
+        self, query: CallbackQuery, callback_data: Optional[CallbackData] = None
+    ) -> Union[bool, Dict[str, Any]]:
+        if not isinstance(callback_data, self.factory):
+            return False
+        return self.rule is None or bool(self.rule.resolve(callback_data))
@@ -1,53 +1,110 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import logging.config
+
+from config_data.config import KEYBOARD_CACHE_SIZE
+from keyboards.callback_data import Navigate, SelectMovie
 from logger_helper.logger_helper import LOGGING_CONFIG
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("inline")
 
 
-def get_movie_selection_keyboard(movies, current_page: int) -> InlineKeyboardMarkup:
+class KeyboardCache:
     """
-    Создает клавиатуру для выбора фильмов.
+    LRU-кэш клавиатур страниц результатов по идентификатору набора и номеру страницы.
 
-    :param movies: Список фильмов для отображения.
-    :param current_page: Текущая страница пагинации.
-    :return: InlineKeyboardMarkup с кнопками для выбора фильмов.
+    Атрибуты:
+        max_size (int): Максимальное количество хранимых клавиатур.
+        hits (int): Количество попаданий в кэш.
+        misses (int): Количество промахов.
     """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._keyboards: "OrderedDict[Tuple[str, int], InlineKeyboardMarkup]" = OrderedDict()
+
+    def get(self, key: Tuple[str, int]) -> Optional[InlineKeyboardMarkup]:
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._keyboards.move_to_end(key)
+        return keyboard
+
+    def put(self, key: Tuple[str, int], keyboard: InlineKeyboardMarkup) -> None:
+        self._keyboards[key] = keyboard
+        self._keyboards.move_to_end(key)
+        while len(self._keyboards) > self.max_size:
+            self._keyboards.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._keyboards)
+
+
+keyboard_cache = KeyboardCache(KEYBOARD_CACHE_SIZE)
+
+
+def _build_movie_selection_keyboard(movies, current_page: int) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardBuilder()
     items_per_page = 6
     start_index = (current_page - 1) * items_per_page
-    logger.debug("Создание клавиатуры для выбора фильмов. Текущая страница: %d", current_page)
-    total_pages = 0
 
     for index, movie in enumerate(movies):
         button_index = start_index + index
         keyboard.add(
             InlineKeyboardButton(
                 text=f"{button_index + 1}. {movie['name']}",
-                callback_data=f"select_movie:{button_index}"
+                callback_data=SelectMovie(index=button_index).pack()
             )
         )
-        total_pages += 1
-        logger.debug("Добавлена кнопка для фильма: %s с индексом %d", movie['name'], button_index)
 
     if current_page > 1:
         keyboard.add(
             InlineKeyboardButton(
                 text="◀️ Назад",
-                callback_data=f"navigate:previous:{current_page - 1}"
+                callback_data=Navigate(direction="previous", page=current_page - 1).pack()
             )
         )
-        logger.debug("Добавлена кнопка 'Назад' на странице %d", current_page)
 
     if items_per_page == len(movies):
         keyboard.add(
             InlineKeyboardButton(
                 text="Дальше ▶️",
-                callback_data=f"navigate:next:{current_page + 1}"
+                callback_data=Navigate(direction="next", page=current_page + 1).pack()
             )
         )
-        logger.debug("Добавлена кнопка 'Дальше' на странице %d", current_page)
 
     return keyboard.adjust(2).as_markup()
+
+
+def get_movie_selection_keyboard(
+    movies, current_page: int, result_id: Optional[str] = None
+) -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру для выбора фильмов.
+
+    Если передан идентификатор набора результатов, готовая клавиатура
+    берется из кэша или сохраняется в него.
+
+    :param movies: Список фильмов для отображения.
+    :param current_page: Текущая страница пагинации.
+    :param result_id: Идентификатор набора результатов в хранилище результатов.
+    :return: InlineKeyboardMarkup с кнопками для выбора фильмов.
+    """
+    if result_id is None:
+        return _build_movie_selection_keyboard(movies, current_page)
+
+    key = (result_id, current_page)
+    keyboard = keyboard_cache.get(key)
+    if keyboard is None:
+        logger.debug("Создание клавиатуры для выбора фильмов. Текущая страница: %d", current_page)
+        keyboard = _build_movie_selection_keyboard(movies, current_page)
+        keyboard_cache.put(key, keyboard)
+    return keyboard
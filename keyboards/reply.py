@@ -50,21 +50,29 @@ genres = [
     "Отмена"
 ]
 
-async def reply_genres():
-    """
-    Создает клавиатуру для выбора жанров.
-
-    :return: ReplyKeyboardMarkup с кнопками жанров.
-    """
+def _build_genres_keyboard() -> ReplyKeyboardMarkup:
     keyboard = ReplyKeyboardBuilder()
 
     for genre in genres:
         keyboard.add(KeyboardButton(text=genre))
-        logger.debug("Добавлен жанр: %s", genre)
 
     return keyboard.adjust(2).as_markup()
 
 
+# Клавиатура жанров не меняется, поэтому собирается один раз при импорте
+genres_keyboard = _build_genres_keyboard()
+logger.debug("Клавиатура жанров создана: %d кнопок", len(genres))
+
+
+async def reply_genres():
+    """
+    Возвращает клавиатуру для выбора жанров.
+
+    :return: ReplyKeyboardMarkup с кнопками жанров.
+    """
+    return genres_keyboard
+
+
 main_menu_keyboard = ReplyKeyboardMarkup(
     keyboard=[
         [KeyboardButton(text="Да")],
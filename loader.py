@@ -0,0 +1,128 @@
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
+
+from api.api import in_flight_requests
+from api.cache_warmer import cache_warmer
+from api.key_pool import key_pool
+from config_data.config import (
+    BOT_TOKEN,
+    KINOPOISK_DAILY_LIMIT,
+    METRICS_HOST,
+    METRICS_PORT,
+    OVERLOAD_API_IN_FLIGHT,
+    OVERLOAD_LAG,
+    OVERLOAD_QUOTA,
+    OVERLOAD_SEND_QUEUE,
+)
+from database.executor import run_db
+from database.known_users import known_users
+from database.poster_cache import poster_cache
+from handlers import router as main_router
+from logger_helper.middleware import HandlerNameMiddleware, UpdateContextMiddleware
+from server.metrics import (
+    HandlerMetricsMiddleware,
+    MetricsServer,
+    register_process_metrics,
+)
+from state.isolation import UserEventIsolation
+from state.reaper import SessionReaper
+from utils.loop_monitor import LoopMonitor
+from utils.overload import OverloadMiddleware, overload_controller
+from utils.send_queue import send_scheduler
+from utils.throttling import ThrottlingMiddleware
+from utils.tracing import TracingMiddleware, TracingRequestMiddleware
+
+
+def create_bot() -> Bot:
+    """Создает экземпляр бота."""
+    bot = Bot(token=BOT_TOKEN)
+    # Спан запроса к Bot API включает ожидание в планировщике отправки
+    bot.session.middleware(TracingRequestMiddleware())
+    # Запросы в чаты проходят через общий планировщик с ограничением частоты
+    bot.session.middleware(send_scheduler)
+    return bot
+
+
+async def on_startup() -> None:
+    """Прогревает кэши перед началом обработки обновлений."""
+    await run_db(known_users.warm_up)
+    await run_db(poster_cache.warm_up)
+
+
+def create_dispatcher(
+    storage: BaseStorage, metrics_port: int = METRICS_PORT, warm_caches: bool = True
+) -> Dispatcher:
+    """
+    Создает диспетчер с подключенными маршрутизаторами и middleware.
+
+    :param storage: Хранилище состояний FSM.
+    :param metrics_port: Порт сервера метрик, 0 — не запускать сервер.
+    :param warm_caches: Прогревать кэш популярных фильтров (при нескольких
+        рабочих процессах — только в одном из них).
+    :return: Настроенный диспетчер.
+    """
+    # События одного пользователя обрабатываются по очереди, разных — параллельно
+    isolation = UserEventIsolation()
+    dp = Dispatcher(storage=storage, events_isolation=isolation)
+    dp.include_router(main_router)
+
+    # Контекст логирования обновления: update_id, пользователь, обработчик, время
+    dp.update.outer_middleware(UpdateContextMiddleware())
+    # Корневой спан трассы обновления (при TRACE_SAMPLE_RATE больше 0)
+    dp.update.outer_middleware(TracingMiddleware())
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+
+    # Отклонение новых поисков при перегрузке; стоит перед ограничением
+    # частоты, чтобы отклоненный поиск не расходовал лимит пользователя
+    dp.message.middleware(OverloadMiddleware())
+    dp.callback_query.middleware(OverloadMiddleware())
+
+    # Ограничение частоты дорогих операций каждого пользователя
+    throttling = ThrottlingMiddleware()
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+
+    reaper = SessionReaper(storage, isolation)
+    dp.update.outer_middleware(reaper)
+    dp.startup.register(reaper.start)
+    dp.shutdown.register(reaper.stop)
+    dp.startup.register(on_startup)
+
+    # Задержка цикла событий: метрика и стеки блокировок
+    loop_monitor = LoopMonitor()
+    dp.startup.register(loop_monitor.start)
+    dp.shutdown.register(loop_monitor.stop)
+
+    # Перегрузка: уменьшение результатов, ответы из кэша, отклонение поисков
+    overload_controller.add_signal("loop_lag", lambda: loop_monitor.lag, OVERLOAD_LAG)
+    overload_controller.add_signal(
+        "api_in_flight", in_flight_requests, OVERLOAD_API_IN_FLIGHT
+    )
+    overload_controller.add_signal(
+        "send_queue",
+        lambda: send_scheduler.stats()["queue_depth"],
+        OVERLOAD_SEND_QUEUE,
+    )
+    if KINOPOISK_DAILY_LIMIT:
+        overload_controller.add_signal(
+            "api_quota", key_pool.remaining, OVERLOAD_QUOTA, higher_is_worse=False
+        )
+    # Расход ключей API восстанавливается из базы и сохраняется при остановке
+    dp.startup.register(key_pool.start)
+    dp.shutdown.register(key_pool.stop)
+    dp.startup.register(overload_controller.start)
+    # Прогрев кэша популярных фильтров после запуска и по расписанию
+    if warm_caches:
+        dp.startup.register(cache_warmer.start)
+        dp.shutdown.register(cache_warmer.stop)
+    dp.shutdown.register(overload_controller.stop)
+
+    register_process_metrics(reaper, isolation, throttling)
+    if metrics_port:
+        metrics_server = MetricsServer(METRICS_HOST, metrics_port)
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+    return dp
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# Сведения об обрабатываемом обновлении: заполняются middleware диспетчера
+# и добавляются ко всем записям логов, сделанным во время обработки
+update_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "update_context", default=None
+)
+
+# Поля контекста, которые переносятся в записи логов. filters_ms — время
+# от начала обработки до вызова обработчика (middleware и фильтры aiogram),
+# search — параметры поиска фильмов (жанр, диапазон рейтинга, бюджет,
+# количество), trace_id — идентификатор трассы, если обновление попало
+# в выборку трассировки
+CONTEXT_FIELDS = (
+    "update_id",
+    "user_id",
+    "handler",
+    "state",
+    "filters_ms",
+    "search",
+    "trace_id",
+)
+
+# Контексты обновлений по задачам asyncio: позволяют из другого потока узнать,
+# какое обновление обрабатывает задача, заблокировавшая цикл событий
+_task_contexts: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def start_update_context(**fields: Any) -> Dict[str, Any]:
+    """
+    Создает контекст обработки обновления для текущей задачи.
+
+    :param fields: Начальные поля контекста (update_id, user_id, state).
+    :return: Словарь контекста, который можно дополнять во время обработки.
+    """
+    context = {
+        **fields,
+        "started_at": time.perf_counter(),
+        "api_calls": 0,
+        "api_seconds": 0.0,
+    }
+    update_context.set(context)
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        _task_contexts[task] = context
+    return context
+
+
+def task_update_context(task: asyncio.Task) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает контекст обновления, обрабатываемого задачей.
+
+    :param task: Задача asyncio.
+    :return: Контекст обновления или None, если задача не обрабатывает обновление.
+    """
+    return _task_contexts.get(task)
+
+
+def record_api_call(seconds: float) -> None:
+    """
+    Учитывает запрос к внешнему API в контексте текущего обновления.
+
+    :param seconds: Длительность запроса в секундах.
+    """
+    context = update_context.get()
+    if context is not None:
+        context["api_calls"] += 1
+        context["api_seconds"] += seconds
+
+
+def set_search_params(**params: Any) -> None:
+    """
+    Записывает в контекст текущего обновления параметры поиска фильмов, чтобы
+    медленные запросы можно было найти в логах по жанру, рейтингу и количеству.
+
+    :param params: Параметры поиска, например genre="драма", count=10.
+    """
+    context = update_context.get()
+    if context is not None:
+        context["search"] = params
+
+
+def describe_search() -> str:
+    """
+    Возвращает параметры поиска текущего обновления для текста записи лога.
+
+    :return: Строка вида "genre=драма count=10" или пустая строка.
+    """
+    context = update_context.get()
+    params = context.get("search") if context is not None else None
+    if not params:
+        return ""
+    return " ".join(f"{name}={value}" for name, value in params.items())
+
+
+def mark_stale_response() -> None:
+    """Отмечает, что при обработке текущего обновления использован устаревший ответ API."""
+    context = update_context.get()
+    if context is not None:
+        context["stale_response"] = True
+
+
+def stale_response_served() -> bool:
+    """Возвращает True, если текущему обновлению отдан устаревший ответ API."""
+    context = update_context.get()
+    return context is not None and context.get("stale_response", False)
+
+
+def mark_api_failure() -> None:
+    """Отмечает, что запрос к API при обработке текущего обновления завершился ошибкой."""
+    context = update_context.get()
+    if context is not None:
+        context["api_failure"] = True
+
+
+def api_request_failed() -> bool:
+    """
+    Возвращает True, если поиск текущего обновления не выполнен из-за ошибки API.
+
+    Модули API при ошибке возвращают пустой список, как и при отсутствии
+    фильмов; флаг позволяет обработчику отличить одно от другого.
+    """
+    context = update_context.get()
+    return context is not None and context.get("api_failure", False)
+
+
+class UpdateContextFilter(logging.Filter):
+    """
+    Фильтр, добавляющий к записям логов поля обрабатываемого обновления:
+    update_id, user_id, handler, state, search (параметры поиска), elapsed_ms (время от начала обработки),
+    api_calls и api_ms (количество и суммарная длительность запросов к API).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = update_context.get()
+        if context is None:
+            return True
+
+        for field in CONTEXT_FIELDS:
+            value = context.get(field)
+            if value is not None:
+                setattr(record, field, value)
+        record.elapsed_ms = round(
+            (time.perf_counter() - context["started_at"]) * 1000, 1
+        )
+        record.api_calls = context["api_calls"]
+        record.api_ms = round(context["api_seconds"] * 1000, 1)
+        return True
@@ -1,133 +1,315 @@
+import atexit
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+
+from logger_helper.context import CONTEXT_FIELDS, UpdateContextFilter
+
+load_dotenv()
 
 current_directory = os.path.dirname(os.path.abspath(__file__))
 log_directory = os.path.join(current_directory, 'loggers')
 os.makedirs(log_directory, exist_ok=True)
 log_filename = os.path.join(log_directory, 'app.log')
 
+# Профиль логирования: development (по умолчанию) — все сообщения от DEBUG,
+# production — в файл от INFO, в консоль только предупреждения и ошибки
+LOG_PROFILE = os.getenv("LOG_PROFILE", "development").lower()
+LOG_LEVEL = "INFO" if LOG_PROFILE == "production" else "DEBUG"
+# Сколько отладочных сообщений с одинаковым шаблоном записывается в секунду
+LOG_DEBUG_RATE = int(os.getenv("LOG_DEBUG_RATE", "10"))
+
+# Формат записей: text (по умолчанию) или json — по одному JSON-объекту в строке
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+TEXT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Поля записи, которые JSON-формат выводит помимо контекста обновления
+JSON_METRIC_FIELDS = ("elapsed_ms", "api_calls", "api_ms")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует записи логов как JSON-объекты для сбора и агрегации.
+
+    Помимо времени, уровня, имени логгера и текста сообщения выводит поля
+    обрабатываемого обновления, если запись сделана во время его обработки.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, LOG_DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS + JSON_METRIC_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    Фильтр, ограничивающий частоту отладочных сообщений.
+
+    Сообщения уровня DEBUG с одним и тем же шаблоном записываются не чаще
+    rate раз в секунду. Количество пропущенных сообщений добавляется
+    к первому записанному сообщению следующей секунды.
+
+    Атрибуты:
+        rate (int): Допустимое количество сообщений одного шаблона в секунду.
+    """
+
+    def __init__(self, rate: int) -> None:
+        super().__init__()
+        self.rate = rate
+        # (логгер, шаблон) -> (начало секунды, записано, пропущено)
+        self._windows: Dict[Tuple[str, str], Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate <= 0:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            started, passed, skipped = self._windows.get(key, (now, 0, 0))
+            if now - started >= 1:
+                started, passed = now, 0
+            if passed >= self.rate:
+                self._windows[key] = (started, passed, skipped + 1)
+                return False
+            self._windows[key] = (started, passed + 1, 0)
+
+        if skipped:
+            record.msg = f"{record.msg} (пропущено похожих сообщений: {skipped})"
+        return True
+
+
+# Записи попадают в очередь без ожидания ввода-вывода, а в консоль и файл
+# их пишет фоновый поток. Очередь и поток общие для всего процесса, так как
+# каждый модуль заново применяет LOGGING_CONFIG.
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+debug_sampler = DebugSampler(LOG_DEBUG_RATE)
+update_context_filter = UpdateContextFilter()
+
+
+def _start_listener() -> logging.handlers.QueueListener:
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        log_filename,
+        when="midnight",  # Время ротации (каждую полночь)
+        interval=1,  # Интервал в днях
+        backupCount=7,  # Количество сохраняемых архивов (0 - не сохранять)
+        encoding="utf-8",
+    )
+    console_handler = logging.StreamHandler()
+    if LOG_PROFILE == "production":
+        console_handler.setLevel(logging.WARNING)
+
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    listener.start()
+    # Перед завершением процесса записываются все сообщения из очереди
+    atexit.register(listener.stop)
+    return listener
+
+
+log_listener = _start_listener()
+
+
+def create_queue_handler() -> logging.handlers.QueueHandler:
+    """Создает обработчик, передающий записи в общую очередь логирования."""
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(debug_sampler)
+    # Контекст обновления доступен только в потоке, сделавшем запись
+    handler.addFilter(update_context_filter)
+    return handler
+
+
 LOGGING_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",  # Формат даты
-        },
-    },
     "handlers": {
-        "timed_rotating_file": {
-            "class": "logging.handlers.TimedRotatingFileHandler",
-            "filename": log_filename,
-            "when": "midnight",  # Время ротации (каждую полночь)
-            "interval": 1,  # Интервал в днях
-            "backupCount": 7,  # Количество сохраняемых архивов (0 - не сохранять)
-            "formatter": "default",
-            "encoding": "utf-8",
-        },
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "default",
+        "queue": {
+            "()": create_queue_handler,
         },
     },
     "loggers": {
         "main": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "api": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "handlers_main": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "common": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "callback_logger": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "movie_search": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "movie_search_api": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "movie_by_rating_api": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "movie_by_rating": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "low_budget_movie": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "low_budget_movie_api": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "high_budget_movie": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "high_budget_movie_api": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "movie_by_genre": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "movie_by_genre_api": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "history": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "export_history": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "fsm_storage": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "server": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "send_queue": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "updates": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "tracing": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "admin": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "loop_monitor": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "overload": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "cache_warmer": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
+            "propagate": False,
+        },
+        "throttling": {
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "database": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "config": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "inline": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
         "reply": {
-            "handlers": ["console", "timed_rotating_file"],
-            "level": "DEBUG",
+            "handlers": ["queue"],
+            "level": LOG_LEVEL,
             "propagate": False,
         },
     },
@@ -0,0 +1,80 @@
+import logging.config
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject, Update
+
+from logger_helper.context import (
+    describe_search,
+    start_update_context,
+    update_context,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("updates")
+
+
+class UpdateContextMiddleware(BaseMiddleware):
+    """
+    Middleware, создающее контекст логирования для каждого обновления.
+
+    Все записи логов, сделанные во время обработки, получают update_id,
+    user_id и состояние FSM. После обработки на уровне DEBUG записывается
+    итоговая строка с обработчиком, параметрами поиска, временем обработки
+    и запросами к API.
+    Регистрируется внешним middleware обновлений после FSM-middleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        context = start_update_context(
+            update_id=event.update_id if isinstance(event, Update) else None,
+            user_id=user.id if user else None,
+            state=data.get("raw_state"),
+        )
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - context["started_at"]
+            logger.debug(
+                "Update %s handled by %s%s in %.1f ms (API: %d calls, %.1f ms)",
+                context["update_id"],
+                context.get("handler", "no handler"),
+                f" [{describe_search()}]" if context.get("search") else "",
+                elapsed * 1000,
+                context["api_calls"],
+                context["api_seconds"] * 1000,
+            )
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Внутреннее middleware, записывающее в контекст логирования имя
+    выбранного обработчика и время, затраченное на поиск обработчика.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context = update_context.get()
+        handler_object = data.get("handler")
+        if context is not None and isinstance(handler_object, HandlerObject):
+            callback = handler_object.callback
+            context["handler"] = (
+                f"{callback.__module__}.{getattr(callback, '__name__', callback)}"
+            )
+            context["filters_ms"] = round(
+                (time.perf_counter() - context["started_at"]) * 1000, 1
+            )
+        return await handler(event, data)
@@ -1,11 +1,12 @@
 import asyncio
 import logging.config
 from logger_helper.logger_helper import LOGGING_CONFIG
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config_data.config import BOT_TOKEN
-from handlers import router as main_router
+from config_data.config import RUN_MODE, WORKERS
+from loader import create_bot, create_dispatcher
+from server.supervisor import run_supervisor
+from server.webhook import run_webhook
+from state.storage import create_storage
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("main")
@@ -16,16 +17,25 @@ async def main() -> None:
     Основная асинхронная функция для запуска бота.
 
     Настраивает логирование, создает экземпляры Bot и Dispatcher,
-    подключает маршрутизатор и запускает опрос.
+    подключает маршрутизатор и запускает опрос или вебхук (RUN_MODE).
+    При WORKERS > 1 запускает супервизор, распределяющий обновления по процессам.
     """
-    bot = Bot(token=BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
-    dp.include_router(main_router)
+    bot = create_bot()
+
+    if WORKERS > 1:
+        logger.info("Бот запущен в многопроцессном режиме: %d процессов.", WORKERS)
+        await run_supervisor(bot)
+        return
+
+    storage = create_storage()
+    dp = create_dispatcher(storage)
 
     try:
         logger.info("Бот успешно запущен и работает.")
-        await dp.start_polling(bot)
+        if RUN_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
     except Exception as e:
         logger.error("Ошибка при запуске бота: %s", e)
 
@@ -0,0 +1,219 @@
+import logging.config
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from api.api import in_flight_requests
+from api.key_pool import key_pool
+from database.known_users import known_users
+from database.poster_cache import poster_cache
+from keyboards.inline import keyboard_cache
+from logger_helper.logger_helper import LOGGING_CONFIG
+from state.isolation import UserEventIsolation
+from state.reaper import SessionReaper
+from utils.metrics import registry
+from utils.overload import overload_controller
+from utils.response_cache import page_counts, response_cache
+from utils.result_store import result_store
+from utils.send_queue import send_scheduler
+from utils.throttling import ThrottlingMiddleware
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("server")
+
+# Тип содержимого текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HANDLER_DURATION = registry.histogram(
+    "bot_handler_duration_seconds",
+    "Длительность выполнения обработчиков",
+    ["handler"],
+)
+HANDLER_ERRORS = registry.counter(
+    "bot_handler_errors",
+    "Исключения, не обработанные обработчиками",
+    ["handler"],
+)
+
+
+def handler_name(handler: Optional[HandlerObject]) -> str:
+    """
+    Возвращает короткое имя обработчика: модуль и функция, например
+    movie_search.process_count.
+    """
+    if handler is None:
+        return "unknown"
+    callback = handler.callback
+    module = callback.__module__.rsplit(".", 1)[-1]
+    return f"{module}.{getattr(callback, '__name__', type(callback).__name__)}"
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутреннее middleware, измеряющее длительность и ошибки обработчиков."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = handler_name(data.get("handler"))
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, name)
+
+
+def _cache_requests() -> Dict[tuple, float]:
+    values = {}
+    for name, cache in (
+        ("result_store", result_store),
+        ("known_users", known_users),
+        ("poster", poster_cache),
+        ("keyboard", keyboard_cache),
+        ("api_response", response_cache),
+        ("page_counts", page_counts),
+    ):
+        values[(name, "hit")] = cache.hits
+        values[(name, "miss")] = cache.misses
+    return values
+
+
+def register_process_metrics(
+    reaper: SessionReaper,
+    isolation: UserEventIsolation,
+    throttling: ThrottlingMiddleware,
+) -> None:
+    """
+    Регистрирует метрики, значения которых берутся из объектов процесса:
+    обращения к кэшам, сессии FSM, очереди событий и исходящих запросов.
+
+    :param reaper: Middleware очистки сессий FSM.
+    :param isolation: Изоляция событий пользователей.
+    :param throttling: Middleware ограничения частоты запросов пользователей.
+    """
+    registry.callback(
+        "cache_requests",
+        "Обращения к кэшам по результату (hit или miss)",
+        _cache_requests,
+        ["cache", "result"],
+        metric_type="counter",
+    )
+    registry.callback(
+        "cache_entries",
+        "Количество записей в кэшах",
+        lambda: {
+            ("result_store",): len(result_store),
+            ("known_users",): len(known_users),
+            ("poster",): len(poster_cache),
+            ("keyboard",): len(keyboard_cache),
+            ("api_response",): len(response_cache),
+            ("page_counts",): len(page_counts),
+        },
+        ["cache"],
+    )
+    registry.callback(
+        "fsm_live_sessions",
+        "Количество живых сессий FSM",
+        lambda: reaper.stats()["live_sessions"],
+    )
+    registry.callback(
+        "fsm_session_bytes",
+        "Примерный объем данных сессий FSM в байтах",
+        lambda: reaper.stats()["bytes_held"],
+    )
+    registry.callback(
+        "bot_active_users",
+        "Пользователи, события которых обрабатываются или ожидают обработки",
+        lambda: isolation.stats()["active_keys"],
+    )
+    registry.callback(
+        "bot_waiting_events",
+        "События, ожидающие завершения предыдущих событий того же пользователя",
+        lambda: isolation.stats()["waiting_events"],
+    )
+    registry.callback(
+        "bot_throttle_buckets",
+        "Счетчики ограничения частоты запросов пользователей в памяти",
+        lambda: len(throttling),
+    )
+    registry.callback(
+        "telegram_send_queue_depth",
+        "Запросы к Bot API, ожидающие отправки",
+        lambda: send_scheduler.stats()["queue_depth"],
+    )
+    registry.callback(
+        "telegram_send_wait_seconds",
+        "Суммарное время ожидания отправки запросов к Bot API",
+        lambda: send_scheduler.stats()["wait_seconds_total"],
+        metric_type="counter",
+    )
+    registry.callback(
+        "kinopoisk_requests_in_flight",
+        "Запросы к API Кинопоиска, ожидающие ответа",
+        in_flight_requests,
+    )
+    if key_pool.limit:
+        registry.callback(
+            "kinopoisk_quota_remaining",
+            "Примерный остаток суточного лимита запросов к API Кинопоиска",
+            lambda: {(key_id,): value for key_id, value in key_pool.stats().items()},
+            ["key"],
+        )
+    registry.callback(
+        "overload_level",
+        "Режим перегрузки: 0 — обычный, 1 — меньше результатов, "
+        "2 — только кэш, 3 — отклонение поисков",
+        lambda: overload_controller.level,
+    )
+    registry.callback(
+        "telegram_retry_after",
+        "Ответы Telegram с требованием повторить запрос позже",
+        lambda: send_scheduler.stats()["retry_after"],
+        metric_type="counter",
+    )
+
+
+class MetricsServer:
+    """
+    HTTP-сервер, отдающий метрики процесса по адресу /metrics.
+
+    Атрибуты:
+        host (str): Адрес, на котором принимаются запросы.
+        port (int): Порт сервера.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    @staticmethod
+    async def _handle(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode("utf-8"),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    async def start(self) -> None:
+        """Запускает сервер метрик."""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Metrics available at http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        """Останавливает сервер метрик."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,355 @@
+import asyncio
+import logging.config
+import multiprocessing
+import secrets
+import signal
+import time
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from typing import Any, Dict, List, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.utils.backoff import Backoff, BackoffConfig
+from aiohttp import web
+
+from config_data.config import (
+    FSM_STORAGE,
+    METRICS_PORT,
+    RUN_MODE,
+    SHUTDOWN_TIMEOUT,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    WORKERS,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+from server.webhook import wait_for_stop_signal
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("server")
+
+# Процессы запускаются через spawn, чтобы не наследовать цикл событий и подключения родителя
+mp = multiprocessing.get_context("spawn")
+
+# Время ожидания обновлений в одном запросе getUpdates (сек.)
+POLLING_TIMEOUT = 30
+# Паузы между повторами getUpdates после ошибки
+POLLING_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=30.0, factor=1.5, jitter=0.1)
+# Паузы перед перезапуском рабочего процесса, который падает раз за разом
+RESTART_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=60.0, factor=2.0, jitter=0.1)
+# Время работы (сек.), после которого процесс считается стабильным и пауза сбрасывается
+RESTART_STABLE_AFTER = 60.0
+
+
+def shard_key(update: Dict[str, Any]) -> int:
+    """
+    Возвращает ключ распределения обновления по процессам: ID пользователя,
+    а если его нет — ID чата.
+
+    :param update: Обновление Telegram в виде словаря.
+    :return: Ключ распределения.
+    """
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+async def _process(dp: Dispatcher, bot: Bot, update: Dict[str, Any]) -> None:
+    try:
+        await dp.feed_raw_update(bot, update)
+    except Exception as e:
+        logger.error("Error processing update %s: %s", update.get("update_id"), e)
+
+
+async def _worker_loop(index: int, queue: Queue) -> None:
+    from loader import create_bot, create_dispatcher
+    from state.storage import create_storage
+
+    storage = create_storage()
+    bot = create_bot()
+    # Каждый рабочий процесс отдает свои метрики на отдельном порту
+    # Кэш популярных фильтров прогревает только первый процесс: иначе каждый
+    # процесс повторял бы те же запросы к API и расходовал суточный лимит
+    dp = create_dispatcher(
+        storage, METRICS_PORT + index if METRICS_PORT else 0, warm_caches=index == 0
+    )
+    loop = asyncio.get_running_loop()
+    tasks: Set[asyncio.Task] = set()
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    logger.info("Worker %d started", index)
+    try:
+        while True:
+            update = await loop.run_in_executor(None, queue.get)
+            if update is None:
+                break
+
+            # Порядок обработки обновлений одного пользователя обеспечивает диспетчер
+            task = asyncio.create_task(_process(dp, bot, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT)
+    finally:
+        # Диспетчер закрывает хранилище FSM при остановке
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        await bot.session.close()
+        logger.info("Worker %d stopped", index)
+
+
+def worker_main(index: int, queue: Queue) -> None:
+    """
+    Точка входа рабочего процесса: обрабатывает обновления из своей очереди.
+
+    :param index: Номер рабочего процесса.
+    :param queue: Очередь обновлений этого процесса.
+    """
+    # Остановкой рабочих процессов управляет супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_worker_loop(index, queue))
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    """
+    Распределяет обновления между рабочими процессами.
+
+    Обновления одного пользователя всегда попадают в один и тот же процесс,
+    поэтому порядок их обработки сохраняется, а данные, которые процесс держит
+    в памяти (результаты поиска, кэши), остаются согласованными.
+
+    Упавший процесс перезапускается с экспоненциально растущей паузой, если он
+    падает снова вскоре после запуска. Обновления, которые он уже взял в
+    обработку или которые остались в его очереди, теряются: процесс мог упасть,
+    удерживая блокировку чтения очереди, поэтому для нового процесса создается
+    новая очередь, а количество потерянных обновлений записывается в лог.
+    Telegram не присылает подтвержденные обновления повторно.
+
+    Атрибуты:
+        workers (int): Количество рабочих процессов.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.queues: List[Queue] = [mp.Queue() for _ in range(workers)]
+        self.processes: List[Optional[BaseProcess]] = [None] * workers
+        self._started_at = [0.0] * workers
+        self._restart_at: List[Optional[float]] = [None] * workers
+        self._backoffs = [Backoff(RESTART_BACKOFF) for _ in range(workers)]
+        self._stopping = False
+
+    def _spawn(self, index: int) -> None:
+        process = mp.Process(
+            target=worker_main,
+            args=(index, self.queues[index]),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+    def start(self) -> None:
+        """Запускает все рабочие процессы."""
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info("Started %d workers", self.workers)
+
+    def dispatch(self, update: Dict[str, Any]) -> None:
+        """
+        Отправляет обновление в рабочий процесс, отвечающий за пользователя.
+
+        :param update: Обновление Telegram в виде словаря.
+        """
+        self.queues[shard_key(update) % self.workers].put(update)
+
+    def _replace_queue(self, index: int) -> int:
+        """
+        Заменяет очередь упавшего процесса новой.
+
+        :return: Количество обновлений, оставшихся в старой очереди.
+        """
+        queue = self.queues[index]
+        try:
+            lost = queue.qsize()
+        except NotImplementedError:
+            lost = -1
+        self.queues[index] = mp.Queue()
+        queue.cancel_join_thread()
+        queue.close()
+        return lost
+
+    def _on_exit(self, index: int, process: BaseProcess) -> None:
+        now = time.monotonic()
+        backoff = self._backoffs[index]
+        if now - self._started_at[index] > RESTART_STABLE_AFTER:
+            backoff.reset()
+        delay = next(backoff)
+        self._restart_at[index] = now + delay
+        lost = self._replace_queue(index)
+        logger.error(
+            "Worker %d exited with code %s, restarting in %.1f s "
+            "(%d restarts in a row); its in-flight updates and %s queued updates are lost",
+            index,
+            process.exitcode,
+            delay,
+            backoff.counter,
+            lost if lost >= 0 else "unknown number of",
+        )
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """Перезапускает завершившиеся рабочие процессы с паузой."""
+        while not self._stopping:
+            for index, process in enumerate(self.processes):
+                if self._stopping:
+                    break
+                restart_at = self._restart_at[index]
+                if restart_at is not None:
+                    if time.monotonic() >= restart_at:
+                        self._restart_at[index] = None
+                        self._spawn(index)
+                elif process is not None and not process.is_alive():
+                    self._on_exit(index, process)
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        """Останавливает рабочие процессы, дав им завершить начатые обработки."""
+        self._stopping = True
+        for queue in self.queues:
+            queue.put(None)
+
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                logger.warning(
+                    "Worker %s did not stop in time, terminating", process.name
+                )
+                process.terminate()
+        logger.info("All workers stopped")
+
+
+async def _receive_polling(
+    supervisor: Supervisor, bot: Bot, stop: asyncio.Event
+) -> None:
+    from handlers import router as main_router
+
+    allowed_updates = main_router.resolve_used_update_types()
+    await bot.delete_webhook()
+    backoff = Backoff(POLLING_BACKOFF)
+    # Запрос должен ждать дольше, чем Telegram держит долгий опрос
+    request_timeout = int(bot.session.timeout + POLLING_TIMEOUT)
+    offset = None
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=POLLING_TIMEOUT,
+                allowed_updates=allowed_updates,
+                request_timeout=request_timeout,
+            )
+        except Exception as e:
+            delay = next(backoff)
+            logger.error(
+                "Failed to fetch updates (%s: %s), retrying in %.1f s",
+                type(e).__name__,
+                e,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            continue
+
+        backoff.reset()
+        for update in updates:
+            supervisor.dispatch(
+                update.model_dump(mode="json", exclude_none=True, by_alias=True)
+            )
+            # Следующий запрос подтверждает получение обновлений
+            offset = update.update_id + 1
+
+
+async def _receive_webhook(
+    supervisor: Supervisor, bot: Bot, stop: asyncio.Event
+) -> None:
+    from handlers import router as main_router
+
+    secret_token = WEBHOOK_SECRET or (
+        secrets.token_urlsafe(32) if WEBHOOK_URL else None
+    )
+
+    async def handle(request: web.Request) -> web.Response:
+        if secret_token and not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token
+        ):
+            return web.Response(status=401, text="Unauthorized")
+        supervisor.dispatch(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    logger.info(
+        "Supervisor listening on %s:%d%s", WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_PATH
+    )
+
+    try:
+        if WEBHOOK_URL:
+            await bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=secret_token,
+                allowed_updates=main_router.resolve_used_update_types(),
+            )
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_supervisor(bot: Bot) -> None:
+    """
+    Запускает бота в многопроцессном режиме (WORKERS > 1).
+
+    Текущий процесс получает обновления (опросом или через вебхук, по RUN_MODE)
+    и распределяет их по рабочим процессам по ID пользователя.
+    Для общего доступа к состояниям требуется постоянное хранилище FSM (sqlite или redis).
+
+    :param bot: Экземпляр бота, через который получаются обновления.
+    """
+    if FSM_STORAGE == "memory":
+        raise ValueError("Для WORKERS > 1 требуется FSM_STORAGE=sqlite или redis")
+
+    supervisor = Supervisor(WORKERS)
+    supervisor.start()
+    stop = wait_for_stop_signal()
+    receive = _receive_webhook if RUN_MODE == "webhook" else _receive_polling
+    receiver = asyncio.create_task(receive(supervisor, bot, stop))
+    watcher = asyncio.create_task(supervisor.watch())
+
+    try:
+        await asyncio.wait(
+            [receiver, asyncio.create_task(stop.wait())],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if receiver.done() and receiver.exception():
+            logger.error("Update receiver failed: %s", receiver.exception())
+    finally:
+        receiver.cancel()
+        watcher.cancel()
+        await supervisor.stop()
+        await bot.session.close()
@@ -0,0 +1,119 @@
+import asyncio
+import logging.config
+import secrets
+import signal
+from typing import Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config_data.config import (
+    SHUTDOWN_TIMEOUT,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("server")
+
+
+class GracefulRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик входящих обновлений, который при остановке сервера
+    дожидается завершения уже принятых обновлений.
+
+    Задачи обработки обновлений учитываются в собственном множестве
+    обработчика, а не во внутреннем множестве aiogram.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pending: Set[asyncio.Task] = set()
+
+    async def _handle_request_background(
+        self, bot: Bot, request: web.Request
+    ) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def wait_pending(self, timeout: float) -> None:
+        """
+        Ожидает завершения обрабатываемых обновлений.
+
+        :param timeout: Максимальное время ожидания в секундах.
+        """
+        pending = set(self._pending)
+        if not pending:
+            return
+
+        logger.info("Waiting for %d updates in progress", len(pending))
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            logger.warning("Cancelled %d unfinished updates", len(not_done))
+
+
+def wait_for_stop_signal() -> asyncio.Event:
+    """Возвращает событие, которое устанавливается при получении SIGINT или SIGTERM."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+    return stop
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """
+    Запускает бота в режиме вебхука на встроенном aiohttp-сервере.
+
+    Если задан WEBHOOK_URL, вебхук регистрируется в Telegram. Без него сервер
+    только принимает POST-запросы с обновлениями (например, от локального
+    нагрузочного стенда). По сигналу остановки сервер перестает принимать
+    запросы и ждет завершения начатых обработок не дольше SHUTDOWN_TIMEOUT секунд.
+
+    :param dp: Диспетчер бота.
+    :param bot: Экземпляр бота.
+    """
+    secret_token = WEBHOOK_SECRET or (
+        secrets.token_urlsafe(32) if WEBHOOK_URL else None
+    )
+    app = web.Application()
+    handler = GracefulRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token)
+    handler.register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    logger.info(
+        "Webhook server listening on %s:%d%s", WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_PATH
+    )
+
+    try:
+        if WEBHOOK_URL:
+            await bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logger.info("Webhook registered: %s", WEBHOOK_URL)
+
+        await wait_for_stop_signal().wait()
+        logger.info("Stopping webhook server")
+    finally:
+        await site.stop()
+        await handler.wait_pending(SHUTDOWN_TIMEOUT)
+        await runner.cleanup()
@@ -0,0 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+
+class _KeyLock:
+    """Блокировка ключа и количество событий, которые ее держат или ждут."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class UserEventIsolation(BaseEventIsolation):
+    """
+    Последовательная обработка событий одного пользователя.
+
+    Используется FSM-middleware диспетчера: события с одинаковым ключом
+    хранилища (пользователь в чате) обрабатываются строго по очереди и в порядке
+    поступления, события разных пользователей — параллельно. Блокировка
+    удаляется, как только у ключа не остается ни обрабатываемых, ни ожидающих
+    событий, поэтому память не растет с числом пользователей.
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[StorageKey, _KeyLock] = {}
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        key_lock = self._locks.get(key)
+        if key_lock is None:
+            key_lock = self._locks[key] = _KeyLock()
+        key_lock.users += 1
+        try:
+            async with key_lock.lock:
+                yield
+        finally:
+            key_lock.users -= 1
+            if not key_lock.users:
+                del self._locks[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает количество пользователей с активными и ожидающими событиями."""
+        return {
+            "active_keys": len(self._locks),
+            "waiting_events": sum(
+                key_lock.users - 1 for key_lock in self._locks.values()
+            ),
+        }
+
+    async def close(self) -> None:
+        self._locks.clear()
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging.config
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StorageKey
+from aiogram.types import TelegramObject
+
+from config_data.config import (
+    FSM_MEMORY_BUDGET,
+    FSM_REAP_INTERVAL,
+    FSM_SESSION_TTL,
+    FSM_SESSION_TTLS,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("fsm_storage")
+
+
+class SessionReaper(BaseMiddleware):
+    """
+    Middleware, удаляющее брошенные сессии FSM.
+
+    На каждое событие запоминает в памяти только время последней активности
+    сессии, без обращений к хранилищу. Фоновая задача раз в interval секунд
+    читает состояние и данные сессий, активных с прошлой проверки, чтобы
+    узнать их группу состояний (Search, Rating, ...) и примерный размер
+    данных, и очищает сессии, неактивные дольше TTL их группы. Если суммарный
+    объем данных превышает memory_budget, очищаются самые давно активные
+    сессии. Чтение и очистка сессии выполняются под блокировкой изоляции
+    событий ее ключа, поэтому не пересекаются с обработкой событий пользователя.
+
+    Атрибуты:
+        storage (BaseStorage): Хранилище состояний FSM.
+        isolation (BaseEventIsolation): Изоляция событий диспетчера.
+        default_ttl (float): TTL для сессий без состояния или неизвестной группы.
+        group_ttls (dict): TTL для групп состояний.
+        memory_budget (int): Допустимый объем данных всех сессий в байтах.
+        interval (float): Интервал проверки сессий в секундах.
+    """
+
+    def __init__(
+        self,
+        storage: BaseStorage,
+        isolation: BaseEventIsolation,
+        default_ttl: float = FSM_SESSION_TTL,
+        group_ttls: Optional[Dict[str, float]] = None,
+        memory_budget: int = FSM_MEMORY_BUDGET,
+        interval: float = FSM_REAP_INTERVAL,
+    ) -> None:
+        self.storage = storage
+        self.isolation = isolation
+        self.default_ttl = default_ttl
+        self.group_ttls = FSM_SESSION_TTLS if group_ttls is None else group_ttls
+        self.memory_budget = memory_budget
+        self.interval = interval
+        # ключ -> (время последней активности, время активности на момент
+        # последней проверки, группа состояний, размер данных)
+        self._sessions: (
+            "OrderedDict[StorageKey, Tuple[float, float, Optional[str], int]]"
+        ) = OrderedDict()
+        self._bytes_held = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            state: Optional[FSMContext] = data.get("state")
+            if state is not None:
+                self.touch(state.key)
+
+    def touch(self, key: StorageKey) -> None:
+        """Запоминает время последней активности сессии."""
+        session = self._sessions.pop(key, None)
+        if session is None:
+            session = (0.0, -1.0, None, 0)
+        self._sessions[key] = (time.monotonic(), *session[1:])
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает количество живых сессий и объем их данных в байтах."""
+        return {"live_sessions": len(self._sessions), "bytes_held": self._bytes_held}
+
+    def _forget(self, key: StorageKey) -> None:
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            self._bytes_held -= session[3]
+
+    async def _inspect(self, key: StorageKey) -> None:
+        """Читает группу состояний и размер данных сессии."""
+        async with self.isolation.lock(key):
+            session = self._sessions.get(key)
+            if session is None:
+                return
+            current_state = await self.storage.get_state(key)
+            current_data = await self.storage.get_data(key)
+            if current_state is None and not current_data:
+                self._forget(key)
+                return
+
+            group = current_state.split(":", 1)[0] if current_state else None
+            size = len(json.dumps(current_data, ensure_ascii=False, default=str))
+            self._bytes_held += size - session[3]
+            self._sessions[key] = (session[0], session[0], group, size)
+
+    async def _clear(self, key: StorageKey, last_seen: float) -> bool:
+        """
+        Очищает сессию, если она не была активна после last_seen.
+
+        :return: True, если сессия очищена.
+        """
+        async with self.isolation.lock(key):
+            session = self._sessions.get(key)
+            if session is None or session[0] != last_seen:
+                return False
+            self._forget(key)
+            await self.storage.set_state(key, None)
+            await self.storage.set_data(key, {})
+            return True
+
+    async def reap(self) -> int:
+        """
+        Очищает сессии, неактивные дольше TTL их группы состояний, и самые
+        давно активные сессии сверх memory_budget.
+
+        :return: Количество очищенных сессий.
+        """
+        changed = [
+            key
+            for key, (last_seen, checked, _, _) in self._sessions.items()
+            if last_seen != checked
+        ]
+        for key in changed:
+            await self._inspect(key)
+
+        now = time.monotonic()
+        expired = [
+            (key, last_seen)
+            for key, (last_seen, _, group, _) in self._sessions.items()
+            if now - last_seen > self.group_ttls.get(group, self.default_ttl)
+        ]
+        reaped = 0
+        for key, last_seen in expired:
+            reaped += await self._clear(key, last_seen)
+        if reaped:
+            logger.info("Reaped %d idle FSM sessions", reaped)
+
+        while self._bytes_held > self.memory_budget and len(self._sessions) > 1:
+            key, (last_seen, *_) = next(iter(self._sessions.items()))
+            logger.info("FSM memory budget exceeded, evicting session %s", key)
+            if await self._clear(key, last_seen):
+                reaped += 1
+
+        logger.debug("FSM sessions: %s", self.stats())
+        return reaped
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.error("Error reaping FSM sessions: %s", e)
+
+    async def start(self) -> None:
+        """Запускает фоновую очистку сессий."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую очистку сессий."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging.config
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config_data.config import (
+    FSM_FLUSH_INTERVAL,
+    FSM_SQLITE_PATH,
+    FSM_STORAGE,
+    FSM_TTL,
+    REDIS_URL,
+    RESULT_STORE_TTL,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("fsm_storage")
+
+# Маркер отсутствующего значения в буфере записи
+_MISSING = object()
+
+
+def dump_data(data: Dict[str, Any]) -> str:
+    """
+    Сериализует данные FSM в компактный JSON.
+
+    Значения, которых нет в JSON (например, даты из строк истории поиска),
+    записываются строками, как и в ResultStore.make_id.
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в файле SQLite.
+
+    Состояния переживают перезапуск бота и доступны нескольким процессам на одной машине.
+    Записи накапливаются в буфере и сбрасываются в базу одной транзакцией раз в
+    flush_interval секунд, чтение сначала проверяет буфер. Записи, которые не
+    обновлялись дольше ttl секунд, считаются устаревшими и периодически удаляются.
+
+    Атрибуты:
+        path (str): Путь к файлу базы данных.
+        ttl (float): Время жизни записи после последнего изменения.
+        flush_interval (float): Интервал пакетной записи в базу.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        flush_interval: float,
+        key_builder: Optional[KeyBuilder] = None,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self._closed = False
+        # Все обращения к базе идут через один поток, которому принадлежит подключение
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}', "
+            "expires_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS fsm_expires ON fsm (expires_at)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "result_id TEXT PRIMARY KEY, items TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        connection.commit()
+        return connection
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _buffer(self, key: StorageKey, field: str, value: Any) -> None:
+        self._pending.setdefault(self.key_builder.build(key), {})[field] = value
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    def _buffered(self, key: StorageKey, field: str) -> Any:
+        storage_key = self.key_builder.build(key)
+        for buffer in (self._pending, self._flushing):
+            value = buffer.get(storage_key, {}).get(field, _MISSING)
+            if value is not _MISSING:
+                return value
+        return _MISSING
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения в базу одной транзакцией."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        # Пока идет запись, чтение продолжает видеть записываемые значения
+        self._flushing = pending
+        try:
+            await self._run(self._write, pending)
+        except Exception as e:
+            logger.error("Error flushing FSM storage: %s", e)
+            for storage_key, fields in pending.items():
+                self._pending[storage_key] = {
+                    **fields,
+                    **self._pending.get(storage_key, {}),
+                }
+        finally:
+            self._flushing = {}
+
+    def _write(self, pending: Dict[str, Dict[str, Any]]) -> None:
+        expires_at = time.time() + self.ttl
+        states = [
+            (storage_key, fields["state"], expires_at)
+            for storage_key, fields in pending.items()
+            if "state" in fields
+        ]
+        data = [
+            (storage_key, fields["data"], expires_at)
+            for storage_key, fields in pending.items()
+            if "data" in fields
+        ]
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO fsm (key, state, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET state = excluded.state, "
+                "expires_at = excluded.expires_at",
+                states,
+            )
+            self._connection.executemany(
+                "INSERT INTO fsm (key, data, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET data = excluded.data, "
+                "expires_at = excluded.expires_at",
+                data,
+            )
+            self._connection.executemany(
+                "DELETE FROM fsm WHERE key = ? AND state IS NULL AND data = '{}'",
+                [(storage_key,) for storage_key in pending],
+            )
+            if time.time() - self._last_purge > self.ttl / 10:
+                self._connection.execute(
+                    "DELETE FROM fsm WHERE expires_at < ?", (time.time(),)
+                )
+                self._connection.execute(
+                    "DELETE FROM results WHERE expires_at < ?", (time.time(),)
+                )
+                self._last_purge = time.time()
+
+    def _read(self, storage_key: str, column: str) -> Optional[str]:
+        row = self._connection.execute(
+            f"SELECT {column} FROM fsm WHERE key = ? AND expires_at >= ?",
+            (storage_key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _write_results(self, result_id: str, items: str, ttl: float) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO results (result_id, items, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (result_id) DO UPDATE SET expires_at = excluded.expires_at",
+                (result_id, items, time.time() + ttl),
+            )
+
+    def _read_results(self, result_id: str) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT items FROM results WHERE result_id = ? AND expires_at >= ?",
+            (result_id, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    async def set_results(self, result_id: str, items: str, ttl: float) -> None:
+        """
+        Сохраняет набор результатов поиска рядом с состояниями FSM.
+
+        :param result_id: Идентификатор набора результатов.
+        :param items: Набор результатов в JSON.
+        :param ttl: Время хранения набора в секундах.
+        """
+        await self._run(self._write_results, result_id, items, ttl)
+
+    async def get_results(self, result_id: str) -> Optional[str]:
+        """
+        Возвращает набор результатов поиска в JSON.
+
+        :param result_id: Идентификатор набора результатов.
+        :return: JSON набора или None, если набор не найден или устарел.
+        """
+        return await self._run(self._read_results, result_id)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._buffer(key, "state", state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state = self._buffered(key, "state")
+        if state is not _MISSING:
+            return state
+        return await self._run(self._read, self.key_builder.build(key), "state")
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        self._buffer(key, "data", dump_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = self._buffered(key, "data")
+        if data is _MISSING:
+            data = await self._run(self._read, self.key_builder.build(key), "data")
+        return json.loads(data) if data else {}
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+        await self.flush()
+        await self._run(self._connection.close)
+        self._executor.shutdown(wait=True)
+
+
+def _results_key(result_id: str) -> str:
+    return f"fsm:results:{result_id}"
+
+
+async def save_results(storage: BaseStorage, result_id: str, items: List[dict]) -> None:
+    """
+    Сохраняет набор результатов поиска в хранилище FSM, чтобы кнопки
+    пагинации и выбора фильма работали после перезапуска бота.
+
+    В MemoryStorage наборы не сохраняются: они живут только в памяти
+    процесса (ResultStore) и теряются при перезапуске вместе с состояниями.
+
+    :param storage: Хранилище состояний FSM.
+    :param result_id: Идентификатор набора результатов.
+    :param items: Список найденных фильмов.
+    """
+    if isinstance(storage, SQLiteStorage):
+        await storage.set_results(result_id, dump_data(items), RESULT_STORE_TTL)
+    elif hasattr(storage, "redis"):
+        await storage.redis.set(
+            _results_key(result_id), dump_data(items), ex=int(RESULT_STORE_TTL)
+        )
+
+
+async def load_results(storage: BaseStorage, result_id: str) -> Optional[List[dict]]:
+    """
+    Загружает набор результатов поиска из хранилища FSM.
+
+    :param storage: Хранилище состояний FSM.
+    :param result_id: Идентификатор набора результатов.
+    :return: Список фильмов или None, если набор не найден или не сохраняется.
+    """
+    if isinstance(storage, SQLiteStorage):
+        items = await storage.get_results(result_id)
+    elif hasattr(storage, "redis"):
+        items = await storage.redis.get(_results_key(result_id))
+    else:
+        return None
+    return json.loads(items) if items else None
+
+
+def create_storage() -> BaseStorage:
+    """
+    Создает хранилище состояний FSM, выбранное в настройках (FSM_STORAGE).
+
+    :return: Хранилище состояний: memory, sqlite или redis.
+    """
+    if FSM_STORAGE == "memory":
+        storage = MemoryStorage()
+    elif FSM_STORAGE == "sqlite":
+        storage = SQLiteStorage(FSM_SQLITE_PATH, FSM_TTL, FSM_FLUSH_INTERVAL)
+    elif FSM_STORAGE == "redis":
+        # Требуется пакет redis (pip install redis)
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        storage = RedisStorage.from_url(
+            REDIS_URL,
+            state_ttl=int(FSM_TTL),
+            data_ttl=int(FSM_TTL),
+            json_dumps=dump_data,
+        )
+    else:
+        raise ValueError(
+            f"Неизвестный FSM_STORAGE: {FSM_STORAGE}. Допустимые значения: memory, sqlite, redis"
+        )
+
+    logger.info("Using %s FSM storage.", FSM_STORAGE)
+    return storage
@@ -0,0 +1,77 @@
+"""
+Сравнение пропускной способности бэкендов базы данных.
+
+Несколько потоков, как пул run_db, одновременно сохраняют результаты поиска
+в историю и читают историю пользователя. Запуск:
+
+    python -m tests.bench_database
+    TEST_DATABASE_URL=postgresql://... python -m tests.bench_database
+"""
+
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database.backends as backends
+from database.model import MODELS, History, User
+from tests.conftest import TEST_DATABASE_URL
+from tests.test_database import make_movie
+
+# Количество потоков, операций каждого потока и фильмов в одной операции
+THREADS = 10
+OPERATIONS = 200
+MOVIES = 10
+
+
+def operation(db, user_id: int) -> None:
+    """Сохраняет результаты поиска и читает историю пользователя."""
+    with db.connection_context():
+        History.save_movies(user_id, [make_movie(index) for index in range(MOVIES)])
+        list(History.select().where(History.user == user_id).limit(50).dicts())
+
+
+def run(db) -> float:
+    """
+    Выполняет операции во всех потоках.
+
+    :return: Количество операций в секунду.
+    """
+    with db.bind_ctx(MODELS):
+        db.drop_tables(MODELS, safe=True)
+        db.create_tables(MODELS)
+        User.insert_many(
+            [{"user_id": user_id, "username": None} for user_id in range(THREADS)]
+        ).execute()
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(THREADS) as executor:
+                futures = [
+                    executor.submit(operation, db, user_id)
+                    for _ in range(OPERATIONS)
+                    for user_id in range(THREADS)
+                ]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            db.drop_tables(MODELS, safe=True)
+            db.close()
+    return THREADS * OPERATIONS / elapsed
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        backends.db_directory = directory
+        print(f"sqlite: {run(backends.create_sqlite_database()):.0f} ops/s")
+
+    if TEST_DATABASE_URL:
+        backends.DATABASE_URL = TEST_DATABASE_URL
+        db = backends.create_postgres_database()
+        print(f"postgres: {run(db):.0f} ops/s")
+        db.close_all()
+    else:
+        print("postgres: skipped, TEST_DATABASE_URL is not set")
+
+
+if __name__ == "__main__":
+    main()
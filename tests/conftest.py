@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+import database.backends as backends
+from database.model import MODELS
+
+# Адрес тестовой базы PostgreSQL; без него тесты PostgreSQL пропускаются
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def database(request, monkeypatch, tmp_path):
+    """
+    Привязывает модели к чистой базе данных выбранного бэкенда.
+
+    :return: Экземпляр базы данных peewee.
+    """
+    if request.param == "sqlite":
+        monkeypatch.setattr(backends, "db_directory", str(tmp_path))
+        db = backends.create_sqlite_database()
+    else:
+        if not TEST_DATABASE_URL:
+            pytest.skip("TEST_DATABASE_URL is not set")
+        monkeypatch.setattr(backends, "DATABASE_URL", TEST_DATABASE_URL)
+        db = backends.create_postgres_database()
+
+    with db.bind_ctx(MODELS):
+        db.drop_tables(MODELS, safe=True)
+        db.create_tables(MODELS)
+        try:
+            yield db
+        finally:
+            db.drop_tables(MODELS, safe=True)
+            db.close()
+            if hasattr(db, "close_all"):
+                db.close_all()
@@ -0,0 +1,89 @@
+from datetime import date
+
+from peewee import fn
+from playhouse.pool import PooledPostgresqlDatabase
+
+from api.key_pool import ApiKeyPool
+from database.known_users import KnownUsers
+from database.model import ApiKeyUsage, History, User
+
+# Идентификаторы Telegram давно вышли за пределы 32-битного целого
+BIG_USER_ID = 7_000_000_001
+
+
+def make_movie(index: int) -> dict:
+    """Возвращает фильм в формате результатов поиска."""
+    return {
+        "name": f"movie{index}",
+        "description": "Описание",
+        "rating": 7.5,
+        "year": 2000,
+        "genres": "драма",
+        "ageRating": 16,
+        "poster_url": f"https://image.example/{index}.jpg",
+    }
+
+
+def test_backend_type(database):
+    if database.__class__.__name__ != "SqliteDatabase":
+        assert isinstance(database, PooledPostgresqlDatabase)
+
+
+def test_save_movies_in_chunks(database):
+    User.create(user_id=BIG_USER_ID, username="user")
+
+    # Больше одной пачки insert_many
+    History.save_movies(BIG_USER_ID, [make_movie(index) for index in range(250)])
+
+    rows = list(
+        History.select(History.name, History.date)
+        .join(User)
+        .where(User.user_id == BIG_USER_ID)
+        .order_by(History.id)
+        .dicts()
+    )
+    assert [row["name"] for row in rows] == [f"movie{index}" for index in range(250)]
+    assert rows[0]["date"] == date.today()
+
+
+def test_history_references_user_id(database):
+    User.create(user_id=BIG_USER_ID, username="first")
+    User.create(user_id=BIG_USER_ID + 1, username="second")
+    History.save_movies(BIG_USER_ID + 1, [make_movie(1)])
+
+    record = History.get()
+
+    # Внешний ключ хранит ID пользователя в Telegram, а не первичный ключ User
+    assert record.user_id == BIG_USER_ID + 1
+    assert record.user.username == "second"
+    assert User.get(User.user_id == BIG_USER_ID + 1).searches.count() == 1
+
+
+def test_known_users_ensure(database):
+    known_users = KnownUsers(max_size=10)
+
+    known_users.ensure(BIG_USER_ID, "old")
+    known_users.ensure(BIG_USER_ID, "old")
+    known_users.ensure(BIG_USER_ID, "new")
+
+    assert User.select().count() == 1
+    assert User.get(User.user_id == BIG_USER_ID).username == "new"
+    assert known_users.hits == 1
+
+
+def test_key_pool_save_adds_usage_of_workers(database):
+    # Два рабочих процесса с одним ключом
+    first = ApiKeyPool(["key"], limit=100, cooldown=60)
+    second = ApiKeyPool(["key"], limit=100, cooldown=60)
+    for _ in range(3):
+        first.acquire()
+    for _ in range(2):
+        second.acquire()
+
+    first.save()
+    second.save()
+    first.save()
+
+    assert ApiKeyUsage.select(fn.SUM(ApiKeyUsage.used)).scalar() == 5
+    assert first.keys[0].used == 5
+    assert second.keys[0].used == 5
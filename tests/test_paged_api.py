@@ -0,0 +1,213 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import api.high_budget_movie_api as high_budget_api
+import api.low_budget_movie_api as low_budget_api
+import api.movie_by_genre_api as genre_api
+import api.movie_by_rating_api as rating_api
+from api import quote_param
+from logger_helper.context import (
+    api_request_failed,
+    stale_response_served,
+    start_update_context,
+)
+from utils.overload import OverloadedError
+from utils.response_cache import page_counts, response_cache
+
+# Модуль API и вызов поиска с постраничной выдачей
+PAGED_SEARCHES = [
+    pytest.param(genre_api, lambda: genre_api.movie_by_genre("драма", 3), id="genre"),
+    pytest.param(
+        rating_api,
+        lambda: rating_api.movie_by_rating("7-10", 3, "драма"),
+        id="rating",
+    ),
+    pytest.param(
+        low_budget_api,
+        lambda: low_budget_api.low_budget_movie("1000-100000", 3, "драма"),
+        id="low_budget",
+    ),
+    pytest.param(
+        high_budget_api,
+        lambda: high_budget_api.high_budget_movie("10000000-900000000", 3, "драма"),
+        id="high_budget",
+    ),
+]
+
+
+def make_page(page: int, pages: int = 5, limit: int = 3) -> dict:
+    """Возвращает ответ API со страницей фильмов."""
+    return {
+        "total": pages * limit,
+        "pages": pages,
+        "page": page,
+        "limit": limit,
+        "docs": [
+            {
+                "name": f"page{page}-movie{index}",
+                "genres": [{"name": "драма"}],
+                "description": "Описание",
+                "year": 2000,
+                "rating": {"imdb": 7.5},
+                "poster": None,
+            }
+            for index in range(limit)
+        ],
+    }
+
+
+def page_of(request_url: str) -> int:
+    return int(request_url.split("page=")[1].split("&")[0])
+
+
+@pytest.fixture(autouse=True)
+def clean_caches(monkeypatch):
+    """Очищает кэши ответов и фиксирует номер случайной страницы."""
+    response_cache._responses.clear()
+    page_counts._totals.clear()
+    monkeypatch.setattr(genre_api.random, "randrange", lambda start, stop: 3)
+    yield
+    response_cache._responses.clear()
+    page_counts._totals.clear()
+
+
+def stub_get_json(monkeypatch, module, fail_page=None, fail_first=None):
+    """
+    Подменяет get_json модуля API.
+
+    :param fail_page: Исключение для случайной страницы.
+    :param fail_first: Исключение для первой страницы.
+    :return: Список запрошенных номеров страниц.
+    """
+    requested = []
+
+    async def get_json(session, request_url):
+        page = page_of(request_url)
+        requested.append(page)
+        error = fail_first if page == 1 else fail_page
+        if error is not None:
+            raise error
+        data = make_page(page)
+        # Как и get_json, запоминает количество фильмов по фильтру
+        page_counts.put(request_url, data)
+        return data
+
+    monkeypatch.setattr(module, "get_json", get_json)
+    return requested
+
+
+@pytest.mark.parametrize("module, search", PAGED_SEARCHES)
+def test_random_page(monkeypatch, module, search):
+    requested = stub_get_json(monkeypatch, module)
+
+    movies = asyncio.run(search())
+
+    assert requested == [1, 3]
+    assert [movie["name"] for movie in movies] == [
+        f"page3-movie{index}" for index in range(3)
+    ]
+
+
+@pytest.mark.parametrize("module, search", PAGED_SEARCHES)
+@pytest.mark.parametrize(
+    "error",
+    [aiohttp.ClientError("upstream failed"), OverloadedError("cached only")],
+    ids=["client_error", "overloaded"],
+)
+def test_random_page_falls_back_to_first_page(monkeypatch, module, search, error):
+    requested = stub_get_json(monkeypatch, module, fail_page=error)
+
+    movies = asyncio.run(search())
+
+    # Первая страница уже получена и повторно не запрашивается
+    assert requested == [1, 3]
+    assert [movie["name"] for movie in movies] == [
+        f"page1-movie{index}" for index in range(3)
+    ]
+
+
+@pytest.mark.parametrize("module, search", PAGED_SEARCHES)
+def test_known_page_count_fetches_first_page_on_failure(monkeypatch, module, search):
+    stub_get_json(monkeypatch, module)
+    asyncio.run(search())
+    requested = stub_get_json(
+        monkeypatch, module, fail_page=aiohttp.ClientError("upstream failed")
+    )
+
+    movies = asyncio.run(search())
+
+    # Количество фильмов известно, поэтому первая страница запрашивается
+    # только после ошибки случайной
+    assert requested == [3, 1]
+    assert movies[0]["name"] == "page1-movie0"
+
+
+@pytest.mark.parametrize("module, search", PAGED_SEARCHES)
+def test_first_page_failure_returns_nothing(monkeypatch, module, search):
+    stub_get_json(monkeypatch, module, fail_first=aiohttp.ClientError("down"))
+
+    async def scenario():
+        start_update_context(update_id=1)
+        return await search(), api_request_failed()
+
+    # Ошибка отличается от пустого результата: обработчик вернет лимит
+    assert asyncio.run(scenario()) == ([], True)
+
+
+@pytest.mark.parametrize("module, search", PAGED_SEARCHES)
+def test_success_is_not_api_failure(monkeypatch, module, search):
+    stub_get_json(monkeypatch, module)
+
+    async def scenario():
+        start_update_context(update_id=1)
+        await search()
+        return api_request_failed()
+
+    assert not asyncio.run(scenario())
+
+
+def test_stale_first_page_is_served_when_upstream_fails(monkeypatch):
+    """
+    Первая страница в кэше давно устарела, API отвечает ошибкой: поиск по
+    жанру возвращает фильмы из устаревшей первой страницы и помечает ответ.
+    """
+
+    async def scenario():
+        async def failing(request):
+            return web.Response(status=502)
+
+        app = web.Application()
+        app.router.add_get("/v1.4/movie/search", failing)
+        app.router.add_get("/v1.4/movie", failing)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        base_url = f"http://127.0.0.1:{port}/"
+        monkeypatch.setattr(genre_api, "url", base_url)
+
+        first_page = (
+            f"{base_url}v1.4/movie/search?page=1&limit=3"
+            f"&genres.name={quote_param('драма')}"
+        )
+        response_cache.put(first_page, make_page(1))
+        stored_at, data = response_cache._responses[first_page]
+        response_cache._responses[first_page] = (stored_at - 20000, data)
+
+        try:
+            start_update_context(update_id=1)
+            movies = await genre_api.movie_by_genre("драма", 3)
+            return movies, stale_response_served()
+        finally:
+            await runner.cleanup()
+
+    movies, stale = asyncio.run(scenario())
+
+    assert [movie["name"] for movie in movies] == [
+        f"page1-movie{index}" for index in range(3)
+    ]
+    assert stale
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import date
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from database.model import History, User
+from state.storage import SQLiteStorage
+from tests.test_database import BIG_USER_ID, make_movie
+from utils.paginator import Paginator, load_paginator, save_paginator
+from utils.result_store import result_store
+
+
+def test_history_results_survive_restart(database, tmp_path):
+    """
+    Результаты /history (строки History с датой) сохраняются в SQLiteStorage
+    и восстанавливаются после перезапуска бота.
+    """
+    User.create(user_id=BIG_USER_ID, username="user")
+    History.save_movies(BIG_USER_ID, [make_movie(index) for index in range(7)])
+    movies = list(History.select().where(History.user == BIG_USER_ID).dicts())
+    key = StorageKey(bot_id=1, chat_id=BIG_USER_ID, user_id=BIG_USER_ID)
+    path = str(tmp_path / "fsm_storage.db")
+
+    async def scenario():
+        storage = SQLiteStorage(path, ttl=3600, flush_interval=0.1)
+        paginator = Paginator(movies, 5)
+        paginator.next()
+        await save_paginator(FSMContext(storage, key), paginator)
+        await storage.close()
+
+        # После перезапуска наборов нет в памяти процесса
+        result_store._results.clear()
+        storage = SQLiteStorage(path, ttl=3600, flush_interval=0.1)
+        try:
+            return paginator.result_id, await load_paginator(FSMContext(storage, key))
+        finally:
+            await storage.close()
+
+    result_id, restored = asyncio.run(scenario())
+
+    assert restored.result_id == result_id
+    assert restored.current_page == 2
+    assert [movie["name"] for movie in restored.get_current()] == ["movie5", "movie6"]
+    # Даты записываются строками
+    assert restored.items[0]["date"] == date.today().isoformat()
+    assert result_store.get(result_id) == restored.items
@@ -0,0 +1,138 @@
+import asyncio
+import logging.config
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from config_data.config import LOOP_LAG_INTERVAL, LOOP_SLOW_CALLBACK
+from logger_helper.context import task_update_context
+from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.metrics import registry
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("loop_monitor")
+
+LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "Задержка срабатывания таймеров цикла событий",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = registry.counter(
+    "event_loop_stalls",
+    "Блокировки цикла событий дольше порога LOOP_SLOW_CALLBACK",
+)
+
+# Глубина стека в сообщении о блокировке цикла событий
+STACK_LIMIT = 30
+
+
+class LoopMonitor:
+    """
+    Монитор задержки цикла событий.
+
+    Фоновая задача с интервалом interval засыпает и измеряет, насколько позже
+    она просыпается: эта задержка (лаг) показывает, как долго цикл событий был
+    занят синхронным кодом. Сторожевой поток замечает блокировку, пока она
+    продолжается, и записывает в лог стек потока цикла событий и обновление,
+    которое обрабатывала заблокировавшая его задача.
+
+    Атрибуты:
+        interval (float): Интервал измерения лага в секундах.
+        slow_threshold (float): Длительность блокировки в секундах, после
+            которой записывается стек (0 — сторожевой поток не запускается).
+        lag (float): Сглаженный лаг: растет сразу, снижается постепенно.
+        max_lag (float): Наибольший измеренный лаг.
+    """
+
+    # Множитель, с которым сглаженный лаг снижается на каждом измерении
+    DECAY = 0.9
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        slow_threshold: float = LOOP_SLOW_CALLBACK,
+    ) -> None:
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = 0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def start(self) -> None:
+        """Запускает измерение лага и сторожевой поток."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._probe())
+        if self.slow_threshold > 0:
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Останавливает измерение лага и сторожевой поток."""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            self._beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+            self.lag = max(lag, self.lag * self.DECAY)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stopping.wait(self.slow_threshold / 4):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked >= self.slow_threshold and beat != reported_beat:
+                reported_beat = beat
+                self._report(blocked)
+
+    def _report(self, blocked: float) -> None:
+        """Записывает в лог стек и обновление, заблокировавшие цикл событий."""
+        LOOP_STALLS.inc()
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)[-STACK_LIMIT:]) if frame else ""
+        task = asyncio.current_task(self._loop)
+        context = task_update_context(task) if task is not None else None
+        fields = {}
+        if context is not None:
+            fields = {
+                key: context.get(key) for key in ("update_id", "user_id", "handler")
+            }
+        logger.warning(
+            "Event loop blocked for over %.0f ms by %s (handler: %s)\n%s",
+            blocked * 1000,
+            task.get_name() if task is not None else "a callback outside tasks",
+            fields.get("handler", "none"),
+            stack,
+            extra=fields,
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает сглаженный и наибольший лаг цикла событий в секундах."""
+        return {"lag": self.lag, "max_lag": self.max_lag}
@@ -0,0 +1,291 @@
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+# Границы корзин гистограмм длительности по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    """
+    Базовый класс метрики с метками.
+
+    Значения для каждого набора меток хранятся отдельно. Метрики обновляются
+    из цикла событий и из потоков базы данных, поэтому изменения защищены блокировкой.
+
+    Атрибуты:
+        name (str): Имя метрики.
+        documentation (str): Описание метрики.
+        labelnames (tuple): Имена меток.
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues: Sequence[str]) -> LabelValues:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {labelvalues}"
+            )
+        return tuple(str(value) for value in labelvalues)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """Возвращает значения метрики: (суффикс имени, метки, значение)."""
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик."""
+
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """
+        Увеличивает счетчик.
+
+        :param labelvalues: Значения меток в порядке labelnames.
+        :param amount: Величина увеличения.
+        """
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "_total", _format_labels(self.labelnames, key), value
+
+
+class Gauge(Metric):
+    """Текущее значение, которое может как расти, так и уменьшаться."""
+
+    type = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        """Устанавливает значение для набора меток."""
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """Изменяет значение на amount (отрицательное значение уменьшает)."""
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Histogram(Metric):
+    """
+    Гистограмма длительностей с фиксированными корзинами.
+
+    Атрибуты:
+        buckets (tuple): Верхние границы корзин в секундах.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счетчики корзин..., сумма, количество]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """
+        Добавляет наблюдение.
+
+        :param value: Наблюдаемая величина (обычно длительность в секундах).
+        :param labelvalues: Значения меток в порядке labelnames.
+        """
+        key = self._key(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """Измеряет длительность выполнения блока."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        names = self.labelnames + ("le",)
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", _format_labels(
+                    names, key + (_format_value(bound),)
+                ), cumulative
+            yield "_bucket", _format_labels(names, key + ("+Inf",)), counts[-1]
+            yield "_sum", _format_labels(self.labelnames, key), counts[-2]
+            yield "_count", _format_labels(self.labelnames, key), counts[-1]
+
+
+class CallbackMetric(Metric):
+    """
+    Метрика, значения которой вычисляются функцией в момент выдачи.
+
+    Используется для величин, которые уже подсчитываются в других объектах
+    (размеры кэшей, количество сессий FSM), чтобы не дублировать учет.
+    Функция возвращает число или словарь {значения меток: число}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], Union[float, Dict[LabelValues, float]]],
+        labelnames: Sequence[str] = (),
+        metric_type: str = "gauge",
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+        self.type = metric_type
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        suffix = "_total" if self.type == "counter" else ""
+        for key, value in values.items():
+            yield suffix, _format_labels(self.labelnames, key), value
+
+
+class Registry:
+    """Реестр метрик процесса, выдающий их в текстовом формате Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Регистрирует метрику. Метрика с тем же именем заменяется.
+
+        :param metric: Метрика.
+        :return: Зарегистрированная метрика.
+        """
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """Создает и регистрирует счетчик."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        """Создает и регистрирует показатель."""
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Создает и регистрирует гистограмму."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], Union[float, Dict[LabelValues, float]]],
+        labelnames: Sequence[str] = (),
+        metric_type: str = "gauge",
+    ) -> CallbackMetric:
+        """Создает и регистрирует метрику, вычисляемую функцией."""
+        return self.register(
+            CallbackMetric(name, documentation, func, labelnames, metric_type)
+        )
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
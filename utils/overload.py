@@ -0,0 +1,260 @@
+import asyncio
+import logging.config
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config_data.config import (
+    OVERLOAD_CHECK_INTERVAL,
+    OVERLOAD_DEGRADED_COUNT,
+    OVERLOAD_RECOVERY_RATIO,
+    OVERLOAD_RECOVERY_TIME,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.metrics import registry
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("overload")
+
+# Режимы работы по возрастанию нагрузки
+NORMAL = 0
+# Поиски выполняются с уменьшенным количеством результатов
+DEGRADED = 1
+# Поиски отвечают только из кэша ответов API
+CACHED_ONLY = 2
+# Новые поиски отклоняются
+REJECT = 3
+
+LEVEL_NAMES = ("normal", "degraded", "cached_only", "reject")
+
+OVERLOAD_MESSAGE = (
+    "Бот сейчас перегружен. Пожалуйста, повторите запрос через несколько секунд."
+)
+
+OVERLOAD_TRANSITIONS = registry.counter(
+    "overload_transitions",
+    "Переходы контроллера перегрузки в режим",
+    ["level"],
+)
+SHED_REQUESTS = registry.counter(
+    "bot_shed_requests",
+    "Поиски, отклоненные из-за перегрузки",
+    ["reason"],
+)
+
+
+class OverloadedError(Exception):
+    """Запрос к API не выполнен: бот перегружен, а в кэше нет ответа."""
+
+
+class Signal:
+    """
+    Показатель нагрузки с порогами перехода в режимы.
+
+    Атрибуты:
+        name (str): Имя показателя для логов.
+        func (Callable): Функция, возвращающая текущее значение.
+        thresholds (tuple): Пороги режимов DEGRADED, CACHED_ONLY, REJECT
+            (можно указать меньше трех).
+        higher_is_worse (bool): False для показателей, у которых опасно малое
+            значение (остаток квоты).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], float],
+        thresholds: Sequence[float],
+        higher_is_worse: bool = True,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.thresholds = tuple(thresholds)
+        self.higher_is_worse = higher_is_worse
+
+    def level(self, value: float, ratio: float = 1.0) -> int:
+        """
+        Возвращает режим, которого требует значение показателя.
+
+        :param value: Значение показателя.
+        :param ratio: Множитель порогов: меньше единицы — пороги выхода из
+            режима (для показателей, у которых опасно малое значение,
+            пороги делятся на него).
+        """
+        level = NORMAL
+        for index, threshold in enumerate(self.thresholds, 1):
+            if self.higher_is_worse:
+                reached = value >= threshold * ratio
+            else:
+                reached = value <= threshold / ratio
+            if reached:
+                level = index
+        return level
+
+
+class OverloadController:
+    """
+    Контроллер перегрузки: по показателям нагрузки (задержка цикла событий,
+    запросы к API в процессе, остаток квоты, очередь отправки) выбирает
+    режим работы бота.
+
+    Режим повышается сразу, как только любой показатель достигает порога.
+    Понижается на одну ступень, только когда все показатели в течение
+    recovery_time секунд остаются ниже порогов, умноженных на recovery_ratio,
+    — так режим не переключается туда и обратно при колебаниях нагрузки.
+
+    Атрибуты:
+        interval (float): Интервал проверки показателей в секундах.
+        recovery_time (float): Время спокойной работы перед понижением режима.
+        recovery_ratio (float): Множитель порогов выхода из режима.
+        degraded_count (int): Наибольшее количество результатов поиска в
+            режимах DEGRADED и выше.
+        level (int): Текущий режим.
+    """
+
+    def __init__(
+        self,
+        interval: float = OVERLOAD_CHECK_INTERVAL,
+        recovery_time: float = OVERLOAD_RECOVERY_TIME,
+        recovery_ratio: float = OVERLOAD_RECOVERY_RATIO,
+        degraded_count: int = OVERLOAD_DEGRADED_COUNT,
+    ) -> None:
+        self.interval = interval
+        self.recovery_time = recovery_time
+        self.recovery_ratio = recovery_ratio
+        self.degraded_count = degraded_count
+        self.level = NORMAL
+        self._signals: List[Signal] = []
+        self._calm_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_signal(
+        self,
+        name: str,
+        func: Callable[[], float],
+        thresholds: Sequence[float],
+        higher_is_worse: bool = True,
+    ) -> None:
+        """
+        Добавляет показатель нагрузки. Показатель без порогов не учитывается.
+
+        :param name: Имя показателя для логов.
+        :param func: Функция, возвращающая текущее значение.
+        :param thresholds: Пороги режимов DEGRADED, CACHED_ONLY, REJECT.
+        :param higher_is_worse: False, если опасно малое значение.
+        """
+        self._signals = [signal for signal in self._signals if signal.name != name]
+        if thresholds:
+            self._signals.append(Signal(name, func, thresholds, higher_is_worse))
+
+    @property
+    def cached_only(self) -> bool:
+        """Поиски должны отвечать только из кэша."""
+        return self.level >= CACHED_ONLY
+
+    def cap_count(self, count: int) -> int:
+        """Уменьшает количество запрашиваемых результатов в режимах перегрузки."""
+        if self.level >= DEGRADED:
+            return min(count, self.degraded_count)
+        return count
+
+    def _evaluate(self, ratio: float) -> Tuple[int, Dict[str, float]]:
+        level = NORMAL
+        values = {}
+        for signal in self._signals:
+            value = values[signal.name] = signal.func()
+            level = max(level, signal.level(value, ratio))
+        return level, values
+
+    def update(self) -> None:
+        """Пересчитывает режим по текущим значениям показателей."""
+        target, values = self._evaluate(1.0)
+        if target > self.level:
+            self._set_level(target, values)
+            self._calm_since = None
+            return
+
+        hold, values = self._evaluate(self.recovery_ratio)
+        if hold >= self.level:
+            self._calm_since = None
+            return
+
+        now = time.monotonic()
+        if self._calm_since is None:
+            self._calm_since = now
+        elif now - self._calm_since >= self.recovery_time:
+            self._set_level(self.level - 1, values)
+            self._calm_since = now
+
+    def _set_level(self, level: int, values: Dict[str, float]) -> None:
+        escalating = level > self.level
+        self.level = level
+        OVERLOAD_TRANSITIONS.inc(LEVEL_NAMES[level])
+        details = ", ".join(f"{name}={value:g}" for name, value in values.items())
+        if escalating:
+            logger.warning(
+                "Overload mode raised to %s (%s)", LEVEL_NAMES[level], details
+            )
+        else:
+            logger.info("Overload mode lowered to %s (%s)", LEVEL_NAMES[level], details)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.update()
+            except Exception as e:
+                logger.error("Error evaluating overload signals: %s", e)
+
+    async def start(self) -> None:
+        """Запускает периодическую проверку показателей."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает проверку показателей."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+overload_controller = OverloadController()
+
+
+async def answer_overloaded(event: TelegramObject) -> None:
+    """Сообщает пользователю, что поиск не выполнен из-за перегрузки."""
+    if isinstance(event, Message):
+        await event.answer(OVERLOAD_MESSAGE)
+    elif isinstance(event, CallbackQuery):
+        await event.answer(OVERLOAD_MESSAGE, show_alert=True)
+
+
+class OverloadMiddleware(BaseMiddleware):
+    """
+    Внутреннее middleware, отклоняющее новые поиски (обработчики с флагом
+    search) в режиме REJECT. Состояние диалога не меняется, поэтому для
+    повтора достаточно отправить то же сообщение еще раз.
+    """
+
+    def __init__(self, controller: OverloadController = overload_controller) -> None:
+        self.controller = controller
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.controller.level < REJECT or not get_flag(data, "search"):
+            return await handler(event, data)
+
+        SHED_REQUESTS.inc("reject")
+        await answer_overloaded(event)
+        return None
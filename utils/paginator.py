@@ -1,8 +1,17 @@
+from typing import Optional
+
+from aiogram.fsm.context import FSMContext
+
+from state.storage import load_results, save_results
+from utils.result_store import result_store
+
+
 class Paginator:
-    def __init__(self, items, items_per_page):
+    def __init__(self, items, items_per_page, result_id=None):
         self.items = items
         self.items_per_page = items_per_page
         self.current_page = 1
+        self.result_id = result_id
 
     def total_pages(self):
         """Возвращает общее количество страниц."""
@@ -47,3 +56,57 @@ class Paginator:
     def is_empty(self):
         """Проверяет, является ли список элементов пустым."""
         return len(self.items) == 0
+
+    def to_state(self):
+        """Возвращает компактное состояние пагинации для хранения в FSM."""
+        return {
+            "result_id": self.result_id,
+            "page": self.current_page,
+            "per_page": self.items_per_page,
+        }
+
+
+async def save_paginator(state: FSMContext, paginator: Paginator) -> None:
+    """
+    Сохраняет состояние пагинации в FSM.
+
+    Сами результаты помещаются в общее хранилище результатов (и в постоянное
+    хранилище FSM, если оно это поддерживает), а в FSM записываются только
+    идентификатор набора, номер страницы и размер страницы.
+
+    :param state: Контекст состояния FSM.
+    :param paginator: Пагинатор с результатами поиска.
+    """
+    if paginator.result_id is None:
+        paginator.result_id = result_store.put(paginator.items)
+        await save_results(state.storage, paginator.result_id, paginator.items)
+    await state.update_data(pagination=paginator.to_state())
+
+
+async def load_paginator(state: FSMContext) -> Optional[Paginator]:
+    """
+    Восстанавливает пагинатор по состоянию FSM.
+
+    Если набора нет в памяти процесса (например, после перезапуска бота),
+    он загружается из постоянного хранилища FSM.
+
+    :param state: Контекст состояния FSM.
+    :return: Пагинатор или None, если пагинации нет или результаты устарели.
+    """
+    data = await state.get_data()
+    pagination = data.get("pagination")
+    if not pagination:
+        return None
+
+    items = result_store.get(pagination["result_id"])
+    if items is None:
+        items = await load_results(state.storage, pagination["result_id"])
+        if items is None:
+            return None
+        result_store.put(items)
+
+    paginator = Paginator(
+        items, pagination["per_page"], result_id=pagination["result_id"]
+    )
+    paginator.current_page = pagination["page"]
+    return paginator
@@ -0,0 +1,299 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Корень проекта: пути файлов проекта в отчетах указываются относительно него
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик потока цикла событий.
+
+    Фоновый поток через равные интервалы снимает стек целевого потока и
+    подсчитывает одинаковые стеки. Профилируемый код не замедляется, кроме
+    кратких захватов GIL при снятии стека.
+
+    Атрибуты:
+        interval (float): Интервал между снимками стека в секундах.
+        thread_id (int): Идентификатор профилируемого потока.
+        stacks (Counter): Время в микросекундах для каждого стека
+            (кортеж функций от корня к листу).
+        samples (int): Количество снимков стека.
+    """
+
+    def __init__(self, interval: float, thread_id: Optional[int] = None) -> None:
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+    def _run(self) -> None:
+        previous = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # Поток профилировщика получает GIL реже, пока целевой поток занят
+            # вычислениями, поэтому снимок учитывается с весом, равным времени
+            # с предыдущего снимка (в микросекундах), а не единицей
+            now = time.perf_counter()
+            weight = int((now - previous) * 1_000_000)
+            previous = now
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += weight
+                self.samples += 1
+
+    def start(self) -> None:
+        """Запускает снятие стеков."""
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает снятие стеков."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """
+        Возвращает стеки в свернутом формате (stack;frames микросекунды),
+        который принимают flamegraph.pl, speedscope и inferno.
+        """
+        return "".join(
+            ";".join(stack) + f" {count}\n" for stack, count in self.stacks.items()
+        )
+
+    def top(self, limit: int) -> List[Tuple[str, int, int]]:
+        """
+        Возвращает функции, на которые пришлось больше всего времени.
+
+        :param limit: Количество функций.
+        :return: Список (функция, собственное время, время с вложенными вызовами)
+            в микросекундах.
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            functions = [frame.rsplit(":", 1)[0] for frame in stack]
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+        return [
+            (function, own[function], count)
+            for function, count in sorted(
+                total.items(), key=lambda item: (own[item[0]], item[1]), reverse=True
+            )[:limit]
+        ]
+
+
+class ProfileSession:
+    """
+    Профилирование работающего бота в течение заданного времени.
+
+    Одновременно может выполняться только одна сессия: результаты пишутся
+    в каталог output_dir, краткий отчет возвращается методом run.
+
+    Атрибуты:
+        mode (str): sample — семплирующий профилировщик, cprofile — cProfile.
+        seconds (float): Длительность профилирования.
+        interval (float): Интервал снимков стека для режима sample.
+        output_dir (str): Каталог для файлов профиля.
+    """
+
+    active: Optional["ProfileSession"] = None
+
+    def __init__(
+        self, mode: str, seconds: float, interval: float, output_dir: str
+    ) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.seconds = seconds
+        self.interval = interval
+        self.output_dir = output_dir
+        self._stopped = asyncio.Event()
+
+    def stop(self) -> None:
+        """Завершает профилирование досрочно."""
+        self._stopped.set()
+
+    async def _wait(self) -> None:
+        try:
+            await asyncio.wait_for(self._stopped.wait(), self.seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _path(self, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.output_dir, f"profile-{stamp}.{extension}")
+
+    async def run(self, limit: int = 15) -> Tuple[str, str]:
+        """
+        Профилирует поток цикла событий до истечения времени или вызова stop.
+
+        :param limit: Количество функций в отчете.
+        :return: Текст отчета и путь к файлу профиля: свернутые стеки для
+            флеймграфа (sample) или файл pstats (cprofile).
+        :raises RuntimeError: Если уже выполняется другая сессия.
+        """
+        if ProfileSession.active is not None:
+            raise RuntimeError("Profiling is already running")
+        ProfileSession.active = self
+        started = time.monotonic()
+        try:
+            if self.mode == "sample":
+                return await self._run_sampling(limit, started)
+            return await self._run_cprofile(limit, started)
+        finally:
+            ProfileSession.active = None
+
+    async def _run_sampling(self, limit: int, started: float) -> Tuple[str, str]:
+        profiler = SamplingProfiler(self.interval)
+        profiler.start()
+        try:
+            await self._wait()
+        finally:
+            await asyncio.to_thread(profiler.stop)
+
+        path = self._path("collapsed.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(profiler.collapsed())
+
+        sampled = sum(profiler.stacks.values()) or 1
+        lines = [
+            f"Профиль: {time.monotonic() - started:.1f} с, "
+            f"снимков стека: {profiler.samples}",
+            "своих % / всего % / функция",
+        ]
+        for function, own, total in profiler.top(limit):
+            lines.append(
+                f"{own * 100 / sampled:5.1f} {total * 100 / sampled:5.1f}  {function}"
+            )
+        return "\n".join(lines), path
+
+    async def _run_cprofile(self, limit: int, started: float) -> Tuple[str, str]:
+        # cProfile учитывает только поток, в котором включен, — поток цикла событий
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self._wait()
+        finally:
+            profiler.disable()
+
+        path = self._path("prof")
+        profiler.dump_stats(path)
+
+        stats = pstats.Stats(profiler)
+        # Сортировка по собственному времени функции (tottime)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+        rows = rows[:limit]
+        lines = [
+            f"cProfile: {time.monotonic() - started:.1f} с, "
+            f"вызовов: {stats.total_calls}",
+            "вызовов / своих мс / всего мс / функция",
+        ]
+        for (filename, line, name), (_, calls, own, total, _) in rows:
+            lines.append(
+                f"{calls:7d} {own * 1000:8.1f} {total * 1000:8.1f}  "
+                f"{_short_path(filename)}:{line}({name})"
+            )
+        return "\n".join(lines), path
+
+
+def _short_path(filename: str) -> str:
+    """Сокращает путь: файлы проекта — относительно корня, библиотеки — от пакета."""
+    path = os.path.abspath(filename)
+    if path.startswith(PROJECT_ROOT + os.sep) and "site-packages" not in path:
+        return os.path.relpath(path, PROJECT_ROOT).replace(os.sep, "/")
+    marker = "site-packages" + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1].replace(os.sep, "/")
+    return os.path.basename(path)
+
+
+def _module_group(filename: str) -> str:
+    """Группа отчета памяти: пакет проекта или библиотеки, например api/*."""
+    short = _short_path(filename)
+    if "/" in short:
+        return short.split("/", 1)[0] + "/*"
+    return short
+
+
+def memory_snapshot(limit: int = 15, frames: int = 1) -> Optional[str]:
+    """
+    Снимает срез выделенной памяти tracemalloc.
+
+    При первом вызове запускает отслеживание выделений и возвращает None:
+    срез имеет смысл снимать после того, как бот поработает под нагрузкой.
+
+    :param limit: Количество строк в каждой группировке.
+    :param frames: Глубина стека, сохраняемого для каждого выделения.
+    :return: Отчет: память по пакетам (api/*, aiogram/*) и по файлам
+        (utils/paginator.py), или None, если отслеживание только запущено.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        return None
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    by_file: Dict[str, List[int]] = {}
+    by_group: Dict[str, List[int]] = {}
+    for stat in snapshot.statistics("filename"):
+        filename = stat.traceback[0].filename
+        for key, groups in (
+            (_short_path(filename), by_file),
+            (_module_group(filename), by_group),
+        ):
+            values = groups.setdefault(key, [0, 0])
+            values[0] += stat.size
+            values[1] += stat.count
+
+    traced, peak = tracemalloc.get_traced_memory()
+    lines = [
+        f"Отслеживается: {traced / 1024 / 1024:.1f} МБ, пик: {peak / 1024 / 1024:.1f} МБ"
+    ]
+    for title, groups in (("По пакетам:", by_group), ("По файлам:", by_file)):
+        lines.append("")
+        lines.append(title)
+        for key, (size, count) in sorted(
+            groups.items(), key=lambda item: item[1][0], reverse=True
+        )[:limit]:
+            lines.append(f"{size / 1024:9.1f} КБ {count:8d}  {key}")
+    return "\n".join(lines)
+
+
+def stop_memory_tracing() -> bool:
+    """
+    Останавливает отслеживание выделений памяти.
+
+    :return: True, если отслеживание было запущено.
+    """
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    return True
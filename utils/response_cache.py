@@ -0,0 +1,174 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from config_data.config import (
+    API_CACHE_MAX_STALE,
+    API_CACHE_SIZE,
+    API_CACHE_TTL,
+    PAGE_COUNTS_SIZE,
+    PAGE_COUNTS_TTL,
+)
+
+
+class ResponseCache:
+    """
+    Кэш ответов API по URL запроса.
+
+    Ответ моложе ttl секунд считается свежим и возвращается вместо запроса
+    к API. Более старые ответы хранятся до max_stale секунд: их можно отдать,
+    пока ответ обновляется в фоне, или когда запрос к API невозможен
+    (при перегрузке или сбое API). При превышении max_size вытесняются самые
+    давно использованные ответы.
+
+    Атрибуты:
+        ttl (float): Время, в течение которого ответ считается свежим.
+        max_stale (float): Максимальный возраст хранимого ответа.
+        max_size (int): Максимальное количество хранимых ответов.
+        hits (int): Количество найденных ответов.
+        misses (int): Количество отсутствующих или слишком старых ответов.
+    """
+
+    def __init__(self, ttl: float, max_stale: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._responses: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def put(self, url: str, data: Any) -> None:
+        """
+        Сохраняет ответ API.
+
+        :param url: URL запроса.
+        :param data: Разобранный JSON-ответ.
+        """
+        self._responses[url] = (time.monotonic(), data)
+        self._responses.move_to_end(url)
+        while len(self._responses) > self.max_size:
+            self._responses.popitem(last=False)
+
+    def _entry(self, url: str) -> Tuple[Optional[Any], float]:
+        stored = self._responses.get(url)
+        if stored is None:
+            return None, math.inf
+        age = time.monotonic() - stored[0]
+        if age > self.max_stale:
+            del self._responses[url]
+            return None, math.inf
+        self._responses.move_to_end(url)
+        return stored[1], age
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """
+        Возвращает сохраненный ответ, если он не старше max_age секунд.
+
+        :param url: URL запроса.
+        :param max_age: Допустимый возраст ответа (по умолчанию ttl).
+        :return: Разобранный JSON-ответ или None.
+        """
+        data, age = self._entry(url)
+        if data is None or age > (self.ttl if max_age is None else max_age):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def lookup(self, url: str) -> Tuple[Optional[Any], float]:
+        """
+        Возвращает сохраненный ответ любого возраста (не старше max_stale).
+
+        :param url: URL запроса.
+        :return: Разобранный JSON-ответ и его возраст в секундах
+            или (None, inf), если ответа нет.
+        """
+        data, age = self._entry(url)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data, age
+
+
+class PageCounts:
+    """
+    Таблица количества найденных фильмов по фильтрам запроса.
+
+    Ключ — путь и параметры запроса без page и limit, поэтому количество,
+    полученное с любой страницы и любым limit, позволяет сразу вычислить
+    число страниц для другого limit и запросить случайную страницу без
+    предварительного запроса первой. Записи старше ttl секунд не используются.
+
+    Атрибуты:
+        ttl (float): Время, в течение которого количество считается точным.
+        max_size (int): Максимальное количество хранимых фильтров.
+        hits (int): Количество найденных записей.
+        misses (int): Количество отсутствующих или устаревших записей.
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._totals: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def __contains__(self, url: str) -> bool:
+        stored = self._totals.get(self.key(url))
+        return stored is not None and time.monotonic() - stored[0] <= self.ttl
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Возвращает ключ фильтра: путь и параметры URL без page и limit."""
+        parts = urlsplit(url)
+        query = [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name not in ("page", "limit")
+        ]
+        return f"{parts.path}?{urlencode(sorted(query))}"
+
+    def put(self, url: str, data: Any) -> None:
+        """
+        Запоминает количество фильмов из ответа API со списком.
+
+        :param url: URL запроса.
+        :param data: Разобранный JSON-ответ (учитывается поле total).
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("total"), int):
+            return
+        key = self.key(url)
+        self._totals[key] = (time.monotonic(), data["total"])
+        self._totals.move_to_end(key)
+        while len(self._totals) > self.max_size:
+            self._totals.popitem(last=False)
+
+    def pages(self, url: str, limit: int) -> Optional[int]:
+        """
+        Возвращает количество страниц для фильтра запроса.
+
+        :param url: URL запроса.
+        :param limit: Количество фильмов на странице.
+        :return: Количество страниц или None, если количество фильмов неизвестно.
+        """
+        key = self.key(url)
+        stored = self._totals.get(key)
+        if stored is None or time.monotonic() - stored[0] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._totals.move_to_end(key)
+        return math.ceil(stored[1] / limit)
+
+
+response_cache = ResponseCache(API_CACHE_TTL, API_CACHE_MAX_STALE, API_CACHE_SIZE)
+page_counts = PageCounts(PAGE_COUNTS_TTL, PAGE_COUNTS_SIZE)
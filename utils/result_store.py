@@ -0,0 +1,91 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from config_data.config import RESULT_STORE_SIZE, RESULT_STORE_TTL
+
+
+class ResultStore:
+    """
+    Общее хранилище результатов поиска.
+
+    Результаты хранятся один раз и доступны по идентификатору, поэтому в состоянии
+    FSM достаточно хранить только идентификатор и номер страницы. Одинаковые
+    наборы результатов (например, у разных пользователей) хранятся в одном экземпляре.
+    Наборы, к которым не обращались дольше ttl секунд, удаляются; при превышении
+    max_size вытесняются самые давно использованные.
+
+    Атрибуты:
+        ttl (float): Время жизни набора результатов после последнего обращения.
+        max_size (int): Максимальное количество хранимых наборов.
+        hits (int): Количество найденных наборов.
+        misses (int): Количество отсутствующих или устаревших наборов.
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._results: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def make_id(items: List[dict]) -> str:
+        """Вычисляет идентификатор набора результатов по его содержимому."""
+        payload = json.dumps(items, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+    def put(self, items: List[dict]) -> str:
+        """
+        Сохраняет набор результатов.
+
+        :param items: Список найденных фильмов.
+        :return: Идентификатор набора результатов.
+        """
+        result_id = self.make_id(items)
+        stored = self._results.get(result_id)
+        self._results[result_id] = (time.monotonic(), stored[1] if stored else items)
+        self._results.move_to_end(result_id)
+        self.purge_expired()
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str) -> Optional[List[dict]]:
+        """
+        Возвращает набор результатов и продлевает время его жизни.
+
+        :param result_id: Идентификатор набора результатов.
+        :return: Список фильмов или None, если набор не найден или устарел.
+        """
+        stored = self._results.get(result_id)
+        if stored is None:
+            self.misses += 1
+            return None
+
+        if time.monotonic() - stored[0] > self.ttl:
+            del self._results[result_id]
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._results[result_id] = (time.monotonic(), stored[1])
+        self._results.move_to_end(result_id)
+        return stored[1]
+
+    def purge_expired(self) -> None:
+        """Удаляет наборы, к которым не обращались дольше ttl секунд."""
+        deadline = time.monotonic() - self.ttl
+        while self._results:
+            result_id, (accessed_at, _) = next(iter(self._results.items()))
+            if accessed_at > deadline:
+                break
+            del self._results[result_id]
+
+
+result_store = ResultStore(RESULT_STORE_TTL, RESULT_STORE_SIZE)
@@ -0,0 +1,273 @@
+import asyncio
+import heapq
+import itertools
+import logging.config
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config_data.config import (
+    TG_CHAT_BURST,
+    TG_CHAT_RATE,
+    TG_GLOBAL_RATE,
+    TG_GROUP_RATE,
+    TG_MAX_RETRIES,
+    WORKERS,
+)
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("send_queue")
+
+# Приоритеты отправки: чем меньше число, тем раньше запрос получает очередь
+INTERACTIVE = 0
+BULK = 1
+
+send_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_sends() -> Iterator[None]:
+    """
+    Помечает запросы к Bot API внутри блока как массовые (рассылки и т.п.).
+
+    Массовые запросы получают очередь только после ответов пользователям.
+    """
+    token = send_priority.set(BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты «ведро токенов» с резервированием.
+
+    Каждый запрос резервирует токен и получает время ожидания, поэтому
+    запросы одного чата выполняются в порядке обращения.
+
+    Атрибуты:
+        rate (float): Скорость пополнения, токенов в секунду.
+        capacity (float): Максимальное количество накопленных токенов.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Резервирует токен.
+
+        :return: Время в секундах, через которое можно выполнить запрос.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.blocked_until - now)
+
+    def try_take(self) -> bool:
+        """Забирает токен, если он есть, не резервируя будущие токены."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1 and now >= self.blocked_until:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Возвращает время до появления следующего токена."""
+        now = time.monotonic()
+        self._refill(now)
+        return max((1 - self.tokens) / self.rate, self.blocked_until - now, 0.0)
+
+    def block(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на указанное время."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def is_idle(self) -> bool:
+        """Проверяет, что ведро полностью пополнено и не заблокировано."""
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов к Bot API.
+
+    Подключается к сессии бота и ограничивает частоту запросов, адресованных
+    чатам (методы с chat_id): общим ведром токенов на весь бот и отдельным
+    ведром на каждый чат (для групп — с меньшей скоростью). Общие токены
+    выдаются в порядке приоритета: ответы пользователям раньше массовых
+    отправок. При TelegramRetryAfter чат блокируется на указанное Telegram
+    время, и запрос повторяется не более max_retries раз.
+
+    При нескольких рабочих процессах (WORKERS) у каждого свой планировщик,
+    поэтому общий лимит делится между ними поровну. Лимиты чатов не делятся:
+    обновления одного пользователя всегда обрабатывает один процесс.
+
+    Атрибуты:
+        global_rate (float): Запросов в секунду на весь бот.
+        workers (int): Количество рабочих процессов, делящих global_rate.
+        chat_rate (float): Запросов в секунду в личный чат.
+        chat_burst (float): Допустимая серия запросов в личный чат.
+        group_rate (float): Запросов в секунду в групповой чат.
+        max_retries (int): Количество повторов после TelegramRetryAfter.
+    """
+
+    # Количество ведер чатов, после которого удаляются ведра неактивных чатов
+    CHATS_GC_THRESHOLD = 1000
+
+    def __init__(
+        self,
+        global_rate: float = TG_GLOBAL_RATE,
+        chat_rate: float = TG_CHAT_RATE,
+        chat_burst: float = TG_CHAT_BURST,
+        group_rate: float = TG_GROUP_RATE,
+        max_retries: int = TG_MAX_RETRIES,
+        workers: int = WORKERS,
+    ) -> None:
+        self.global_rate = global_rate
+        self.workers = max(workers, 1)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        # Доля процесса в общем лимите; в ведре помещается хотя бы один запрос
+        process_rate = global_rate / self.workers
+        self._global = TokenBucket(process_rate, max(process_rate, 1))
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        # (приоритет, порядковый номер, ожидающий запрос)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._chat_waiting = 0
+        self._waited = 0
+        self._wait_seconds = 0.0
+        self._max_wait = 0.0
+        self._retries = 0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._retries += 1
+                self._bucket(chat_id).block(e.retry_after)
+                logger.warning(
+                    "Flood control in chat %s, retrying %s in %d s",
+                    chat_id,
+                    type(method).__name__,
+                    e.retry_after,
+                )
+
+    def _bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.CHATS_GC_THRESHOLD:
+                self._chats = {
+                    key: value
+                    for key, value in self._chats.items()
+                    if not value.is_idle()
+                }
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, 1)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, chat_id: Union[int, str]) -> None:
+        started = time.monotonic()
+
+        delay = self._bucket(chat_id).reserve()
+        if delay > 0:
+            self._chat_waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._chat_waiting -= 1
+
+        if self._waiters or not self._global.try_take():
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                self._waiters, (send_priority.get(), next(self._sequence), future)
+            )
+            if self._pump is None or self._pump.done():
+                self._pump = asyncio.create_task(self._release_waiters())
+            await future
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self._waited += 1
+            self._wait_seconds += waited
+            self._max_wait = max(self._max_wait, waited)
+
+    async def _release_waiters(self) -> None:
+        """Выдает общие токены ожидающим запросам в порядке приоритета."""
+        while self._waiters:
+            if not self._global.try_take():
+                await asyncio.sleep(self._global.wait_time())
+                continue
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
+            else:
+                # Токен не понадобился: ожидающие запросы были отменены
+                self._global.tokens += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает длину очереди и статистику ожидания отправки."""
+        return {
+            "queue_depth": len(self._waiters) + self._chat_waiting,
+            "waited_requests": self._waited,
+            "wait_seconds_total": self._wait_seconds,
+            "wait_seconds_max": self._max_wait,
+            "retry_after": self._retries,
+        }
+
+
+send_scheduler = SendScheduler()
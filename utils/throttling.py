@@ -0,0 +1,178 @@
+import logging.config
+import math
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config_data.config import ADMIN_IDS, THROTTLE_MAX_BUCKETS, THROTTLE_RULES
+from logger_helper.logger_helper import LOGGING_CONFIG
+from utils.metrics import registry
+from utils.send_queue import TokenBucket
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("throttling")
+
+THROTTLED_REQUESTS = registry.counter(
+    "bot_throttled_requests",
+    "Запросы пользователей, отклоненные ограничением частоты",
+    ["group"],
+)
+
+THROTTLE_MESSAGE = "Слишком много запросов. Пожалуйста, повторите через {seconds} с."
+
+# Ведро, из которого оплачено обрабатываемое событие
+_charged_bucket: ContextVar[Optional["ThrottleBucket"]] = ContextVar(
+    "charged_bucket", default=None
+)
+
+
+def parse_rule(rule: str) -> Optional[Tuple[float, float]]:
+    """
+    Разбирает правило ограничения частоты вида "запросов/секунд".
+
+    :param rule: Правило, например "5/60" — не больше 5 запросов за 60 секунд.
+    :return: Скорость пополнения (запросов в секунду) и размер серии запросов
+        или None, если ограничение отключено.
+    :raises ValueError: Если правило записано неверно.
+    """
+    rule = rule.strip()
+    if not rule or rule == "0":
+        return None
+    count, _, seconds = rule.partition("/")
+    capacity = float(count)
+    period = float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Invalid throttle rule: {rule}")
+    return capacity / period, capacity
+
+
+class ThrottleBucket(TokenBucket):
+    """Ведро токенов пользователя с отметкой, до какого времени он предупрежден."""
+
+    __slots__ = ("warned_until",)
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        super().__init__(rate, capacity)
+        self.warned_until = 0.0
+
+    def refund(self) -> None:
+        """Возвращает забранный токен."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+def refund_throttle() -> None:
+    """
+    Возвращает пользователю токен, потраченный на текущее событие.
+
+    Вызывается обработчиком, который отклонил запрос, не выполнив дорогой
+    операции (неверный ввод, отказ из-за перегрузки, ошибка API), чтобы такой запрос
+    не расходовал лимит пользователя.
+    """
+    bucket = _charged_bucket.get()
+    if bucket is not None:
+        bucket.refund()
+        _charged_bucket.set(None)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внутреннее middleware, ограничивающее частоту дорогих операций
+    каждого пользователя.
+
+    Обработчики помечаются флагом throttle с названием группы (search,
+    history, export, paging); для каждой пары (пользователь, группа) ведется
+    отдельное ведро токенов по правилу группы, поэтому листание страниц
+    не расходует лимит поисков. Обработчики без флага не ограничиваются.
+    Обработчик, отклонивший запрос без дорогой операции, возвращает токен
+    через refund_throttle.
+    Пользователь получает ответ со временем ожидания один раз, пока действует
+    ограничение, — повторные сообщения во время ограничения пропускаются
+    без ответа, чтобы не тратить на них запросы к Bot API.
+
+    Ведра хранятся в памяти не больше max_buckets: при превышении сначала
+    удаляются полностью пополненные ведра, затем самые давно использованные.
+
+    Атрибуты:
+        rules (dict): Группа -> (скорость пополнения, размер серии).
+        max_buckets (int): Максимальное количество хранимых ведер.
+        exempt (set): ID пользователей без ограничений.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Dict[str, str]] = None,
+        max_buckets: int = THROTTLE_MAX_BUCKETS,
+        exempt: Iterable[int] = ADMIN_IDS,
+    ) -> None:
+        self.rules = {}
+        for group, rule in (THROTTLE_RULES if rules is None else rules).items():
+            parsed = parse_rule(rule)
+            if parsed is not None:
+                self.rules[group] = parsed
+        self.max_buckets = max_buckets
+        self.exempt = set(exempt)
+        self._buckets: "OrderedDict[Tuple[int, str], ThrottleBucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self) -> None:
+        self._buckets = OrderedDict(
+            (key, bucket)
+            for key, bucket in self._buckets.items()
+            if not bucket.is_idle()
+        )
+        while len(self._buckets) >= self.max_buckets:
+            self._buckets.popitem(last=False)
+
+    def _bucket(self, user_id: int, group: str) -> ThrottleBucket:
+        key = (user_id, group)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._evict()
+            bucket = self._buckets[key] = ThrottleBucket(*self.rules[group])
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        group = get_flag(data, "throttle")
+        user = data.get("event_from_user")
+        if group not in self.rules or user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        bucket = self._bucket(user.id, group)
+        if bucket.try_take():
+            token = _charged_bucket.set(bucket)
+            try:
+                return await handler(event, data)
+            finally:
+                _charged_bucket.reset(token)
+
+        THROTTLED_REQUESTS.inc(group)
+        now = time.monotonic()
+        wait = bucket.wait_time()
+        if now < bucket.warned_until:
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            return None
+
+        bucket.warned_until = now + wait
+        logger.info("User %s throttled in group %s for %.1f s", user.id, group, wait)
+        text = THROTTLE_MESSAGE.format(seconds=math.ceil(wait))
+        if isinstance(event, Message):
+            await event.reply(text)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        return None
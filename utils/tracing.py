@@ -0,0 +1,482 @@
+import abc
+import atexit
+import json
+import logging.config
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from config_data.config import (
+    TRACE_EXPORTER,
+    TRACE_FILE,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_SAMPLE_RATE,
+    TRACE_SERVICE_NAME,
+)
+from logger_helper.context import update_context
+from logger_helper.logger_helper import LOGGING_CONFIG
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logging.config.dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger("tracing")
+
+# Виды спанов в нумерации OTLP
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# Коды статуса спана в нумерации OTLP
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+AttributeValue = Union[str, int, float, bool]
+
+
+class Span:
+    """
+    Операция, входящая в трассу обработки обновления.
+
+    Атрибуты:
+        name (str): Название операции.
+        trace_id (str): Идентификатор трассы (32 шестнадцатеричных символа).
+        span_id (str): Идентификатор спана (16 шестнадцатеричных символов).
+        parent_id (str | None): Идентификатор родительского спана.
+        kind (int): Вид спана в нумерации OTLP.
+        attributes (dict): Атрибуты операции.
+        start_ns (int): Время начала в наносекундах от эпохи.
+        end_ns (int): Время окончания в наносекундах от эпохи.
+        status (int): Код статуса в нумерации OTLP.
+        status_message (str): Описание ошибки.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "kind",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "status",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        kind: int,
+        attributes: Dict[str, AttributeValue],
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Optional[AttributeValue]) -> None:
+        """Устанавливает атрибут спана. Значение None пропускается."""
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        """Отмечает спан как завершившийся ошибкой."""
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает спан в виде словаря для JSON-файла."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": "error" if self.status == STATUS_ERROR else "ok",
+            "status_message": self.status_message or None,
+        }
+
+
+class _NoopSpan:
+    """Спан, который ничего не записывает: для трасс, не попавших в выборку."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Optional[AttributeValue]) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(abc.ABC):
+    """Базовый класс экспортера: получает пачки завершенных спанов."""
+
+    @abc.abstractmethod
+    def export(self, spans: List[Span]) -> None:
+        """
+        Выгружает пачку спанов. Вызывается из фонового потока.
+
+        :param spans: Завершенные спаны.
+        """
+
+    def shutdown(self) -> None:
+        """Освобождает ресурсы экспортера (по умолчанию освобождать нечего)."""
+        return None
+
+
+class JsonFileExporter(SpanExporter):
+    """
+    Экспортер, дописывающий спаны в файл по одному JSON-объекту в строке.
+
+    Атрибуты:
+        path (str): Путь к файлу.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: List[Span]) -> None:
+        for span in spans:
+            self._file.write(json.dumps(span.to_dict(), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def shutdown(self) -> None:
+        self._file.close()
+
+
+def _otlp_value(value: AttributeValue) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, AttributeValue]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+class OtlpHttpExporter(SpanExporter):
+    """
+    Экспортер в формате OTLP/HTTP JSON для локального коллектора
+    (OpenTelemetry Collector, Jaeger, Tempo).
+
+    Атрибуты:
+        endpoint (str): Адрес приема трасс, например http://127.0.0.1:4318/v1/traces.
+        service_name (str): Имя сервиса в ресурсе трассы.
+        timeout (float): Таймаут запроса в секундах.
+    """
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": self.service_name}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [self._span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    @staticmethod
+    def _span(span: Span) -> Dict[str, Any]:
+        data = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(span.attributes),
+            "status": {"code": span.status},
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        if span.status_message:
+            data["status"]["message"] = span.status_message
+        return data
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self._payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchSpanProcessor:
+    """
+    Накапливает завершенные спаны и выгружает их пачками в фоновом потоке,
+    чтобы запись в файл и запросы к коллектору не задерживали цикл событий.
+
+    Атрибуты:
+        exporter (SpanExporter): Экспортер спанов.
+        max_batch (int): Максимальный размер пачки.
+        interval (float): Максимальная задержка выгрузки в секундах.
+        max_queue (int): Количество ожидающих спанов, сверх которого новые
+            спаны отбрасываются.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        max_batch: int = 256,
+        interval: float = 2.0,
+        max_queue: int = 8192,
+    ) -> None:
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def on_end(self, span: Span) -> None:
+        """Ставит завершенный спан в очередь выгрузки."""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    span = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning("Failed to export %d spans: %s", len(batch), e)
+
+    def shutdown(self) -> None:
+        """Выгружает оставшиеся спаны и останавливает фоновый поток."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=self.interval + 5)
+            self.exporter.shutdown()
+
+
+class Tracer:
+    """
+    Трассировщик: создает спаны и передает завершенные спаны процессору.
+
+    Решение о записи принимается для корневого спана (обновления) с
+    вероятностью sample_rate; дочерние спаны записываются только внутри
+    записываемой трассы, поэтому без трассировки затраты сводятся к чтению
+    контекстной переменной.
+
+    Атрибуты:
+        sample_rate (float): Доля записываемых трасс от 0 до 1.
+        processor (BatchSpanProcessor | None): Процессор завершенных спанов.
+    """
+
+    def __init__(
+        self, sample_rate: float, processor: Optional[BatchSpanProcessor]
+    ) -> None:
+        self.sample_rate = sample_rate if processor is not None else 0.0
+        self.processor = processor
+
+    @contextmanager
+    def _record(self, span: Span) -> Iterator[Span]:
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.processor.on_end(span)
+
+    @contextmanager
+    def root_span(
+        self, name: str, **attributes: AttributeValue
+    ) -> Iterator[Union[Span, _NoopSpan]]:
+        """
+        Начинает трассу с корневым спаном, если трасса попала в выборку.
+
+        :param name: Название операции.
+        :param attributes: Атрибуты спана.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            token = current_span.set(None)
+            try:
+                yield NOOP_SPAN
+            finally:
+                current_span.reset(token)
+            return
+
+        span = Span(
+            name, f"{random.getrandbits(128):032x}", None, SPAN_KIND_SERVER, attributes
+        )
+        with self._record(span):
+            yield span
+
+    @contextmanager
+    def span(
+        self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: AttributeValue
+    ) -> Iterator[Union[Span, _NoopSpan]]:
+        """
+        Начинает дочерний спан текущей трассы.
+
+        :param name: Название операции.
+        :param kind: Вид спана в нумерации OTLP.
+        :param attributes: Атрибуты спана.
+        """
+        parent = current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+
+        span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        with self._record(span):
+            yield span
+
+
+def create_tracer() -> Tracer:
+    """Создает трассировщик по настройкам TRACE_*."""
+    if TRACE_SAMPLE_RATE <= 0 or TRACE_EXPORTER == "none":
+        return Tracer(0.0, None)
+    if TRACE_EXPORTER == "otlp":
+        exporter = OtlpHttpExporter(TRACE_OTLP_ENDPOINT, TRACE_SERVICE_NAME)
+    elif TRACE_EXPORTER == "file":
+        exporter = JsonFileExporter(TRACE_FILE)
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {TRACE_EXPORTER}")
+    return Tracer(TRACE_SAMPLE_RATE, BatchSpanProcessor(exporter))
+
+
+tracer = create_tracer()
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешнее middleware обновлений, открывающее корневой спан трассы.
+
+    Идентификатор трассы добавляется в контекст логирования, поэтому записи
+    логов можно сопоставить с трассой. Регистрируется после
+    UpdateContextMiddleware.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else "update"
+        with tracer.root_span(f"update {update_type}") as span:
+            context = update_context.get()
+            if context is not None and isinstance(span, Span):
+                context["trace_id"] = span.trace_id
+            user = data.get("event_from_user")
+            span.set_attribute("update.id", getattr(event, "update_id", None))
+            span.set_attribute("user.id", user.id if user else None)
+            span.set_attribute("fsm.state", data.get("raw_state"))
+            try:
+                return await handler(event, data)
+            finally:
+                if context is not None:
+                    span.set_attribute("handler", context.get("handler"))
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота, создающее спан для каждого запроса к Bot API.
+
+    Подключается к сессии первым, чтобы спан включал ожидание в планировщике
+    отправки.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with tracer.span(f"telegram {method.__api_method__}", SPAN_KIND_CLIENT) as span:
+            span.set_attribute("telegram.chat_id", getattr(method, "chat_id", None))
+            return await make_request(bot, method)